@@ -0,0 +1,21 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ailments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ailmentitem',
+            index=models.Index(fields=['content_type', 'object_id'], name='ailments_ai_content_9bc6ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ailmentitem',
+            index=models.Index(fields=['ailment', 'content_type', 'object_id'], name='ailments_ai_ailment_c2df3c_idx'),
+        ),
+    ]
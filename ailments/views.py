@@ -1,11 +1,18 @@
+from django.contrib.contenttypes.models import ContentType
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet
+from store.listing import get_listings
+from store.models import Product
+from store.pagination import DefaultPagination
+from store.serializers import ProductListingSerializer, selected_fields
 from .models import Ailment, AilmentItem
 from .serializers import AilmentSerializer
 
 
 class AilmentViewSet(ModelViewSet):
     http_method_names = ['get']
-    queryset = Ailment.objects.all()
+    queryset = Ailment.objects.prefetch_related('ailmentitems__content_object').all()
     serializer_class = AilmentSerializer
     search_fields = ['title']
 
@@ -16,3 +23,19 @@ class AilmentViewSet(ModelViewSet):
             'view': self
         })
         return context
+
+    @action(detail=True, pagination_class=DefaultPagination)
+    def products(self, request, pk):
+        get_object_or_404(Ailment.objects.only('id'), pk=pk)
+        # product ids come straight off the (ailment, content_type, object_id) index
+        product_ids = AilmentItem.objects \
+            .filter(ailment_id=pk, content_type=ContentType.objects.get_for_model(Product)) \
+            .values('object_id')
+        # page over product ids, then read the page from the projection
+        page = self.paginate_queryset(Product.objects
+            .filter(pk__in=product_ids)
+            .order_by('name', 'id')
+            .values_list('id', flat=True))
+        listings = get_listings(list(page), selected_fields(request, ProductListingSerializer.Meta.fields))
+        serializer = ProductListingSerializer(listings, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
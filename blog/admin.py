@@ -3,6 +3,7 @@ from django.db.models.aggregates import Count
 from django.db.models.query import QuerySet
 from django.utils.html import format_html, urlencode
 from django.urls import reverse
+from core.images import variant_urls
 from . import models
 
 
@@ -12,7 +13,8 @@ class BlogPostImageInline(admin.TabularInline):
 
     def thumbnail(self, instance):
         if instance.image.name!= '':
-            return format_html(f'<img src="{instance.image.url}" class="thumbnail">')
+            url = variant_urls(instance.variants).get('thumb', {}).get('jpeg', instance.image.url)
+            return format_html(f'<img src="{url}" class="thumbnail">')
         return ''
 
 @admin.register(models.BlogPost)
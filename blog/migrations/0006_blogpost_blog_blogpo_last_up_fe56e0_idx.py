@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_alter_blogpost_content'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['last_update', 'id'], name='blog_blogpo_last_up_fe56e0_idx'),
+        ),
+    ]
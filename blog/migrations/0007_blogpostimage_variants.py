@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blogpost_blog_blogpo_last_up_fe56e0_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpostimage',
+            name='variants',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
@@ -12,9 +12,13 @@ class BlogPost(models.Model):
 
     class Meta:
         ordering = ['last_update']
+        indexes = [
+            models.Index(fields=['last_update', 'id']),
+        ]
 
 class BlogPostImage(models.Model):
     blogpost = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='image')
     image = models.ImageField(
         upload_to='blog/images',
         validators=[validate_file_size])
+    variants = models.JSONField(default=dict, editable=False)
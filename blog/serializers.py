@@ -1,15 +1,18 @@
 from rest_framework import serializers
+from core.images import ImageVariantsField
 from .models import BlogPost, BlogPostImage
 
 
 class BlogPostImageSerializer(serializers.ModelSerializer):
+    variants = ImageVariantsField()
+
     def create(self, validated_data):
         blogpost_id = self.context['blogpost_id']
         return BlogPostImage.objects.create(blogpost_id=blogpost_id, **validated_data)
 
     class Meta:
         model = BlogPostImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'variants']
 
 class BlogSerializer(serializers.ModelSerializer):
     image = BlogPostImageSerializer(many=True, read_only=True)
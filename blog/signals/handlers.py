@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from blog.models import BlogPost, BlogPostImage
+from core.tasks import queue_image_variants
+
+
+# touch the post so its Last-Modified / ETag validators move
+@receiver([post_save, post_delete], sender=BlogPostImage)
+def touch_blogpost(sender, instance, **kwargs):
+    BlogPost.objects.filter(pk=instance.blogpost_id).update(last_update=timezone.now())
+
+
+@receiver(post_save, sender=BlogPostImage)
+def generate_blogpost_image_variants(sender, instance, **kwargs):
+    queue_image_variants(instance)
@@ -1,13 +1,16 @@
 from django.shortcuts import render
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
+from core.mixins import ConditionalGetMixin
+from store.pagination import BlogPostKeysetPagination
 from .models import BlogPost
 from .serializers import BlogSerializer
 
 
 # Create your views here.
-class BlogViewSet(ModelViewSet):
+class BlogViewSet(ConditionalGetMixin, ModelViewSet):
     http_method_names = ['get']
     queryset = BlogPost.objects.all()
     serializer_class = BlogSerializer
+    pagination_class = BlogPostKeysetPagination
     search_fields = ['title']
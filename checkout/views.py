@@ -6,14 +6,19 @@ import stripe
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from store.models import Customer, Membership
+from core.idempotency import idempotency_key, idempotent
 from core.models import User
 
 class CreateCheckoutSession(APIView):
+    @idempotent
     def post(self, request):
         dataDict = dict(request.data)
         product_name = dataDict['product_name']
         print(dataDict['metadata'])
         metadata = dataDict['metadata']
+        # lets Stripe drop a retried create too
+        key = idempotency_key(request)
+        options = {'idempotency_key': key} if key else {}
 
         if 'sub' in dataDict:
           lookup_key = dataDict['lookup_key']
@@ -34,7 +39,8 @@ class CreateCheckoutSession(APIView):
                 mode='subscription',
                 success_url='http://localhost:3000/Home?payment=success#isRegistered/',
                 cancel_url='https://treatnaturally.co.uk',
-                metadata={'username': metadata}
+                metadata={'username': metadata},
+                **options
             )
             # Extract the subscription ID and customer ID from the created session
             sub_id = checkout_session.subscription
@@ -67,6 +73,7 @@ class CreateCheckoutSession(APIView):
                     mode='payment',
                     success_url= f"http://localhost:3000/checkout?payment=success#ischecked&{reg}",
                     cancel_url='https://treatnaturally.co.uk/',
+                    **options
                 )
 
                 return Response({'session_id': checkout_session.id})
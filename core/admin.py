@@ -3,13 +3,14 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.contenttypes.admin import GenericTabularInline
 from django.http import HttpResponseRedirect
 from django.urls import path, reverse
+from django.utils import timezone
 from store.admin import ProductAdmin, ProductImageInline, ProductVariationInline
 from blog.admin import BlogAdmin, BlogPostImageInline
 from tags.models import TaggedItem
 from store.models import Product
 from blog.models import BlogPost
 from ailments.models import AilmentItem
-from .models import BusinessDetails, Graphics, HomePageSlider, HomePageSmallPicture, HomePageIcon, Logo, ContactFormEntry, User
+from .models import BusinessDetails, Graphics, HomePageSlider, HomePageSmallPicture, HomePageIcon, Logo, ContactFormEntry, OutboundEmail, User
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -96,6 +97,24 @@ class ContactFormEntryAdmin(admin.ModelAdmin):
     search_fields = ['name__istartswith', 'email__istartswith']
 
 
+class OutboundEmailAdmin(admin.ModelAdmin):
+    actions = ['retry']
+    list_display = ['subject', 'to', 'status', 'attempts', 'created_at', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = ['subject', 'body', 'html_body', 'from_email', 'to', 'status', 'attempts', 'last_error', 'next_attempt_at', 'created_at', 'sent_at']
+    list_per_page = 50
+
+    @admin.action(description='Retry selected emails')
+    def retry(self, request, queryset):
+        updated = queryset \
+            .exclude(status=OutboundEmail.STATUS_SENT) \
+            .update(status=OutboundEmail.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f'{updated} emails were queued again.')
+
+    def has_add_permission(self, request):
+        return False
+
+
 class TagInline(GenericTabularInline):
     autocomplete_fields = ['tag']
     model = TaggedItem
@@ -114,6 +133,7 @@ class CustomBlogAdmin(BlogAdmin):
 admin.site.register(BusinessDetails, BusinessDetailsAdmin)
 admin.site.register(Graphics, GraphicsAdmin)
 admin.site.register(ContactFormEntry, ContactFormEntryAdmin)
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
 admin.site.unregister(Product)
 admin.site.register(Product, CustomProductAdmin)
 admin.site.unregister(BlogPost)
@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from core.outbox import queue_email
 from django.conf import settings
 from django.urls import reverse
 
@@ -14,7 +14,7 @@ def send_user_registration_mail(user):
     from_email = settings.DEFAULT_FROM_EMAIL
     recipient_list = [user.email]
     html_message = f'<html><body style="font-family: Arial">{message}</body></html>'
-    send_mail(subject, message, from_email, recipient_list, html_message=html_message)
+    queue_email(subject, message, from_email, recipient_list, html_message=html_message)
 
 def send_contact_form_entry_alert_mail(contactentry):
     subject = f'New Contact Form Entry #{contactentry.id}'
@@ -26,4 +26,4 @@ def send_contact_form_entry_alert_mail(contactentry):
     from_email = settings.DEFAULT_FROM_EMAIL
     recipient_list = ['info@treatnaturally.co.uk']
     html_message = f'<html><body style="font-family: Arial">{message}</body></html>'
-    send_mail(subject, message, from_email, recipient_list, html_message=html_message)
\ No newline at end of file
+    queue_email(subject, message, from_email, recipient_list, html_message=html_message)
\ No newline at end of file
@@ -0,0 +1,113 @@
+import time
+from functools import wraps
+from hashlib import md5
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_TTL = getattr(settings, 'IDEMPOTENCY_TTL', 60 * 60 * 24)
+# how long a request may hold its key, and how long a duplicate waits for it
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+
+# deletes the lock only while it still holds this request's token
+RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+def idempotency_key(request):
+    """
+    The request's Idempotency-Key scoped to its user and path, for passing
+    on to services such as Stripe. None when the header wasn't sent.
+    """
+    client_key = request.META.get(IDEMPOTENCY_HEADER)
+    if not client_key:
+        return None
+    return md5(f'{request.user.pk}:{request.path}:{client_key}'.encode()).hexdigest()
+
+
+def _release(lock_key, token):
+    client = getattr(cache, 'client', None)
+    if hasattr(client, 'get_client'):
+        # django-redis: compare and delete in one round trip
+        client.get_client(write=True).eval(RELEASE_SCRIPT, 1, client.make_key(lock_key), client.encode(token))
+    elif cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response(
+            {'detail': 'This Idempotency-Key was already used with a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if 'data' in stored:
+        response = Response(stored['data'], status=stored['status'])
+    else:
+        response = HttpResponse(stored['content'], status=stored['status'], content_type=stored['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _store(key, response, fingerprint):
+    stored = {'fingerprint': fingerprint, 'status': response.status_code}
+    if isinstance(response, Response):
+        stored['data'] = response.data
+    else:
+        stored['content'] = response.content
+        stored['content_type'] = response['Content-Type']
+    cache.set(key, stored, IDEMPOTENCY_TTL)
+
+
+def idempotent(handler):
+    """
+    Makes a view handler honour the Idempotency-Key request header.
+
+    A successful response is kept for IDEMPOTENCY_TTL seconds per user,
+    path and key, and a retry with the same key gets it back without the
+    handler running again. Error responses aren't kept, so a failed
+    request can be retried. A duplicate that arrives while the first is
+    still running waits on a cache lock for its result.
+    """
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        scope = idempotency_key(request)
+        if scope is None:
+            return handler(self, request, *args, **kwargs)
+
+        key = f'idempotency:{scope}'
+        lock_key = f'idempotency:lock:{scope}'
+        fingerprint = md5(request.body).hexdigest()
+        # a handler can outlive LOCK_TIMEOUT, after which a duplicate may
+        # hold the lock; the token keeps this request from releasing it
+        token = uuid4().hex
+
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            stored = cache.get(key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            if cache.add(lock_key, token, LOCK_TIMEOUT):
+                break
+            if time.monotonic() > deadline:
+                return Response(
+                    {'detail': 'A request with this Idempotency-Key is still being processed.'},
+                    status=status.HTTP_409_CONFLICT)
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            # the first request may have finished between the get and the add
+            stored = cache.get(key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            response = handler(self, request, *args, **kwargs)
+            if 200 <= response.status_code < 300:
+                _store(key, response, fingerprint)
+            return response
+        finally:
+            _release(lock_key, token)
+    return wrapper
@@ -0,0 +1,88 @@
+import os
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+
+# name: (max width, max height, crop to fill)
+VARIANTS = {
+    'thumb': (150, 150, True),
+    'card': (480, 480, False),
+    'full': (1600, 1600, False),
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def _encode(image, format):
+    if format == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode in ('RGBA', 'LA'):
+            background.paste(image, mask=image.getchannel('A'))
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, **FORMATS[format])
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(field_file):
+    """
+    Writes every variant of `field_file` next to the original and returns
+    the storage names, keyed by variant then format, plus the source name
+    they were made from.
+    """
+    root, _ = os.path.splitext(field_file.name)
+    with field_file.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    variants = {'source': field_file.name}
+    for variant, (width, height, crop) in VARIANTS.items():
+        resized = _resize(image, width, height, crop)
+        variants[variant] = {
+            format: field_file.storage.save(f'{root}_{variant}.{format}', _encode(resized, format))
+            for format in FORMATS
+        }
+    return variants
+
+
+def delete_variants(variants, storage=default_storage):
+    for variant in VARIANTS:
+        for name in variants.get(variant, {}).values():
+            storage.delete(name)
+
+
+def variant_urls(variants, storage=default_storage):
+    return {
+        variant: {format: storage.url(name) for format, name in variants[variant].items()}
+        for variant in VARIANTS
+        if variant in variants
+    }
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        urls = variant_urls(variants or {})
+        if request is None:
+            return urls
+        return {
+            variant: {format: request.build_absolute_uri(url) for format, url in formats.items()}
+            for variant, formats in urls.items()
+        }
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_businessdetails_refunds_and_returns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessdetails',
+            name='last_update',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='graphics',
+            name='last_update',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
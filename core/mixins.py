@@ -0,0 +1,61 @@
+from hashlib import md5
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve.
+
+    Validators come from a single aggregate over `last_modified_field`
+    (max plus row count, so deletes are noticed too), which means a 304
+    never touches the serializer. Related rows that are part of the
+    payload are expected to touch their parent's `last_modified_field`.
+    """
+    last_modified_field = 'last_update'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_validators(self, request):
+        model = self.get_queryset().model
+        queryset = model.objects.all()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+        try:
+            aggregate = queryset.aggregate(
+                last_modified=Max(self.last_modified_field), count=Count('pk'))
+        except (ValueError, ValidationError):
+            return None, None
+        if aggregate['last_modified'] is None:
+            return None, None
+
+        fingerprint = ':'.join([
+            model._meta.label,
+            request.accepted_renderer.format,
+            str(aggregate['count']),
+            aggregate['last_modified'].isoformat(),
+        ])
+        return aggregate['last_modified'], f'"{md5(fingerprint.encode()).hexdigest()}"'
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        last_modified, etag = self.get_validators(request)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        timestamp = int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ['Accept'])
+        return response
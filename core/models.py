@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.forms import ValidationError
 from django.urls import reverse
+from django.utils import timezone
 from ckeditor.fields import RichTextField
 
 
@@ -10,6 +11,8 @@ class User(AbstractUser):
   email = models.EmailField(unique=True)
 
 class Graphics(models.Model):
+    last_update = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name_plural = 'Graphics'
 
@@ -82,6 +85,7 @@ class BusinessDetails(models.Model):
     business_phone = models.CharField(max_length=255, null=True, blank=True)
     business_address = models.CharField(max_length=255, null=True, blank=True)
     refunds_and_returns = RichTextField(null=True, blank=True)
+    last_update = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = 'Business Details'
@@ -109,4 +113,38 @@ class ContactFormEntry(models.Model):
 
     class Meta:
         ordering = ['id']
-        verbose_name_plural = 'Contact Form Entries'
\ No newline at end of file
+        verbose_name_plural = 'Contact Form Entries'
+
+
+class OutboundEmail(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['status', 'sent_at']),
+        ]
+
+    def __str__(self):
+        return self.subject
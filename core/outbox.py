@@ -0,0 +1,122 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboundEmail
+
+
+MAX_ATTEMPTS = 8
+
+# how long a worker has to send a claimed message before another may
+LEASE = timedelta(minutes=15)
+
+
+def queue_email(subject, message, from_email, recipient_list, html_message=None):
+    """Records a message for deliver_pending to send; same arguments as send_mail."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(recipient_list))
+
+
+def retry_delay(attempts):
+    # 1, 2, 4 ... minutes, capped at six hours
+    return timedelta(minutes=min(2 ** (attempts - 1), 6 * 60))
+
+
+def _claim(batch_size):
+    """
+    Leases up to `batch_size` due messages to this worker: they're marked
+    as sending, with next_attempt_at pushed LEASE ahead, in a transaction
+    that only lasts as long as the update. A message whose worker died
+    mid-send becomes due again once its lease runs out.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        OutboundEmail.objects \
+            .filter(status=OutboundEmail.STATUS_SENDING, next_attempt_at__lte=now, attempts__gte=MAX_ATTEMPTS) \
+            .update(status=OutboundEmail.STATUS_DEAD, last_error='The lease on the last attempt ran out.')
+        batch = list(OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=[OutboundEmail.STATUS_PENDING, OutboundEmail.STATUS_SENDING], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size])
+        for email in batch:
+            email.status = OutboundEmail.STATUS_SENDING
+            email.attempts += 1
+            email.next_attempt_at = now + LEASE
+        OutboundEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at'])
+    return batch
+
+
+def _deliver(connection, email):
+    message = EmailMultiAlternatives(email.subject, email.body, email.from_email, email.to, connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    try:
+        connection.open()
+        message.send()
+    except Exception as error:
+        # recorded rather than raised, so one bad message can't hold up the rest
+        connection.close()
+        email.last_error = f'{type(error).__name__}: {error}'
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = OutboundEmail.STATUS_DEAD
+        else:
+            email.status = OutboundEmail.STATUS_PENDING
+            email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+        return False
+    email.status = OutboundEmail.STATUS_SENT
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    return True
+
+
+def deliver_pending(batch_size=100):
+    """
+    Sends the messages that are due, `batch_size` at a time, over one SMTP
+    connection that stays open across batches.
+
+    Each batch is leased with SKIP LOCKED so concurrent workers share the
+    queue, and sent outside any transaction so no row locks are held while
+    SMTP is slow. A failed message is retried with exponential backoff and
+    dead-lettered after MAX_ATTEMPTS. Returns the number of messages sent
+    and failed.
+    """
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        while True:
+            batch = _claim(batch_size)
+            for email in batch:
+                if _deliver(connection, email):
+                    sent += 1
+                else:
+                    failed += 1
+            OutboundEmail.objects.bulk_update(batch, ['status', 'last_error', 'next_attempt_at', 'sent_at'])
+            if len(batch) < batch_size:
+                break
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def purge_sent(max_age=None, batch_size=1000):
+    """
+    Deletes messages sent more than `max_age` seconds (OUTBOX_RETENTION by
+    default) ago, oldest first, one short transaction per `batch_size`
+    rows. Dead messages are kept for the admin. Returns the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age or getattr(settings, 'OUTBOX_RETENTION', 60 * 60 * 24 * 30))
+    expired = OutboundEmail.objects.filter(status=OutboundEmail.STATUS_SENT, sent_at__lt=cutoff).order_by('sent_at')
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            count, _ = OutboundEmail.objects.filter(pk__in=ids).delete()
+        deleted += count
+    return deleted
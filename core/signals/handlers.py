@@ -3,10 +3,12 @@ from django.conf import settings
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.db import transaction
-from core.emails import send_user_registration_mail, send_contact_form_entry_alert_mail
+from core.emails import send_contact_form_entry_alert_mail
+from core.tasks import deliver_outbox
 from store.signals import order_created
 from django.db.models.signals import pre_save
-from core.models import ContactFormEntry
+from django.utils import timezone
+from core.models import ContactFormEntry, Graphics, HomePageIcon, HomePageSlider, HomePageSmallPicture, Logo
 
 @receiver(order_created)
 def on_order_created(sender, **kwargs):
@@ -14,14 +16,18 @@ def on_order_created(sender, **kwargs):
 
 
 
-# @receiver(pre_save, sender=settings.AUTH_USER_MODEL)
-# def send_registration_success(sender, instance, **kwargs):
-#     if instance._state.adding:
-#         transaction.on_commit(lambda: send_user_registration_mail(instance))
-
-
 # send new contact form entry alert to admin
 @receiver(post_save, sender=ContactFormEntry)
 def send_order_confirmation(sender, instance, created, **kwargs):
     if created:
-        transaction.on_commit(lambda: send_contact_form_entry_alert_mail(instance))
\ No newline at end of file
+        send_contact_form_entry_alert_mail(instance)
+        transaction.on_commit(lambda: deliver_outbox.delay())
+
+
+# touch the graphics singleton so its Last-Modified / ETag validators move
+@receiver([post_save, post_delete], sender=HomePageSlider)
+@receiver([post_save, post_delete], sender=HomePageSmallPicture)
+@receiver([post_save, post_delete], sender=HomePageIcon)
+@receiver([post_save, post_delete], sender=Logo)
+def touch_graphics(sender, instance, **kwargs):
+    Graphics.objects.filter(pk=instance.graphics_id).update(last_update=timezone.now())
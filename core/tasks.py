@@ -0,0 +1,36 @@
+from celery import shared_task
+from django.apps import apps
+from django.db import transaction
+from .images import delete_variants, generate_variants
+from .outbox import deliver_pending, purge_sent
+
+
+@shared_task
+def generate_image_variants(model_label, pk):
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return
+
+    previous = instance.variants
+    instance.variants = generate_variants(instance.image)
+    # a regular save so the parent's cache / listing / ETag receivers run
+    instance.save(update_fields=['variants'])
+    if previous.get('source') and previous['source'] != instance.image.name:
+        delete_variants(previous, instance.image.storage)
+
+
+def queue_image_variants(instance):
+    if instance.image and instance.variants.get('source') != instance.image.name:
+        model_label = instance._meta.label
+        transaction.on_commit(lambda: generate_image_variants.delay(model_label, instance.pk))
+
+
+@shared_task
+def deliver_outbox(batch_size=100):
+    sent, failed = deliver_pending(batch_size=batch_size)
+    return {'sent': sent, 'failed': failed}
+
+
+@shared_task
+def purge_outbox(batch_size=1000):
+    return purge_sent(batch_size=batch_size)
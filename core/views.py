@@ -2,6 +2,7 @@ from django.shortcuts import render
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
 from rest_framework.permissions import AllowAny
+from .mixins import ConditionalGetMixin
 from .models import BusinessDetails, Graphics, ContactFormEntry
 from .serializers import BusinessDetailsSerializer, MyTokenObtainPairSerializer, GraphicsSerializer, ContactFormEntrySerializer
     
@@ -9,7 +10,7 @@ class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
 
-class GraphicsViewSet(ModelViewSet):
+class GraphicsViewSet(ConditionalGetMixin, ModelViewSet):
     permission_classes = [AllowAny]
     serializer_class = GraphicsSerializer
     http_method_names = ['get']
@@ -22,7 +23,7 @@ class ContactFormEntryViewSet(ModelViewSet):
     http_method_names = ['post']
     queryset = ContactFormEntry.objects.all()
 
-class BusinessDetailsViewSet(ModelViewSet):
+class BusinessDetailsViewSet(ConditionalGetMixin, ModelViewSet):
     permission_classes= [AllowAny]
     serializer_class = BusinessDetailsSerializer
     http_method_names = ['get']
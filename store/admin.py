@@ -4,7 +4,11 @@ from django.db.models.query import QuerySet
 from django.utils.html import format_html, urlencode
 from django.urls import reverse
 from django import forms
+from core.images import variant_urls
 from . import models
+from .caching import invalidate
+from .listing import refresh_listings_on_commit
+from .inventory import set_stock
 
 
 class StockFilter(admin.SimpleListFilter):
@@ -27,7 +31,8 @@ class ProductImageInline(admin.TabularInline):
 
     def thumbnail(self, instance):
         if instance.image.name!= '':
-            return format_html(f'<img src="{instance.image.url}" class="thumbnail">')
+            url = variant_urls(instance.variants).get('thumb', {}).get('jpeg', instance.image.url)
+            return format_html(f'<img src="{url}" class="thumbnail">')
         return ''
 
 class ProductVariationInline(admin.TabularInline):
@@ -60,7 +65,11 @@ class ProductAdmin(admin.ModelAdmin):
 
     @admin.action(description='Clear stock')
     def clear_stock(self, request, queryset):
+        product_ids = list(queryset.values_list('pk', flat=True))
+        set_stock({(pk, None): 0 for pk in product_ids})
         updated_count = queryset.update(stock=0)
+        invalidate('products', *[f'product:{pk}' for pk in product_ids])
+        refresh_listings_on_commit(product_ids)
         self.message_user(
             request,
             f'{updated_count} products were successfully updated.',
@@ -73,6 +82,22 @@ class ProductAdmin(admin.ModelAdmin):
         }
 
 
+@admin.register(models.StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    autocomplete_fields = ['product']
+    list_display = ['key', 'product', 'variation', 'delta', 'reason', 'order', 'created_at']
+    list_filter = ['reason', 'created_at']
+    list_select_related = ['product', 'variation__product', 'order__billing_address']
+    list_per_page = 50
+
+    # the ledger is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(models.Category)
 class CategoryAdmin(admin.ModelAdmin):
     autocomplete_fields = ['featured_product']
@@ -146,6 +171,7 @@ class InterestAdmin(admin.ModelAdmin):
 
 class OrderItemInline(admin.TabularInline):
     autocomplete_fields = ['product']
+    raw_id_fields = ['variation']
     min_num = 1
     max_num = 10
     model = models.OrderItem
@@ -0,0 +1,87 @@
+import time
+from hashlib import md5
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60 * 24)
+CACHED_HEADERS = ['ETag', 'Last-Modified', 'Vary']
+
+
+def _generation_key(namespace):
+    return f'catalog:generation:{namespace}'
+
+
+def get_generations(namespaces):
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    generations = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in generations}
+    if missing:
+        # Seed with a timestamp rather than a counter so an evicted
+        # generation can never collide with one used by a stale entry.
+        cache.set_many(missing, timeout=None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+def invalidate(*namespaces):
+    # Deferred until commit so a concurrent reader can't re-cache the
+    # pre-commit state under the new generation.
+    transaction.on_commit(lambda: cache.set_many(
+        {_generation_key(namespace): time.time_ns() for namespace in namespaces},
+        timeout=None))
+
+
+def response_cache_key(request, namespaces):
+    generations = get_generations(namespaces)
+    query = sorted(request.query_params.lists())
+    digest = md5(f'{request.path}:{query}:{generations}'.encode()).hexdigest()
+    return f'catalog:response:{digest}'
+
+
+class CatalogCacheMixin:
+    """
+    Read-through cache for anonymous GET responses.
+
+    Entries are keyed by path, query string and the generation of every
+    namespace the response depends on; `invalidate()` bumps a generation,
+    which orphans the matching entries without having to enumerate them.
+    """
+    cache_namespaces = []
+
+    def get_cache_namespaces(self):
+        return self.cache_namespaces
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+
+        key = response_cache_key(request, self.get_cache_namespaces())
+        cached = cache.get(key)
+        if cached is not None:
+            data, headers = cached
+            response = get_conditional_response(
+                request,
+                etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(headers.get('Last-Modified', '')))
+            if response is None:
+                response = Response(data)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            headers = {header: response[header] for header in CACHED_HEADERS if response.has_header(header)}
+            cache.set(key, (response.data, headers), CATALOG_CACHE_TIMEOUT)
+        return response
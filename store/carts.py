@@ -0,0 +1,307 @@
+from datetime import timedelta
+from uuid import UUID
+import redis
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Prefetch, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from .models import Cart, CartItem, Product, ProductVariation
+
+
+CART_TTL = getattr(settings, 'CART_TTL', 60 * 60 * 24 * 7)
+
+# the largest quantity CartItem.quantity (a PositiveSmallIntegerField) holds
+MAX_QUANTITY = 32767
+
+
+def _with_items(cart, items):
+    # what prefetch_related leaves behind, so cart.items.all() runs no query
+    queryset = CartItem.objects.all()
+    queryset._result_cache = items
+    queryset._prefetch_done = True
+    cart._prefetched_objects_cache = {'items': queryset}
+    return cart
+
+
+class SQLCartStorage:
+    """Carts and their items as Cart/CartItem rows."""
+
+    def create(self):
+        return _with_items(Cart.objects.create(), [])
+
+    def get(self, cart_id):
+        return Cart.objects \
+            .prefetch_related(Prefetch('items', queryset=CartItem.objects.select_related('product', 'variation'))) \
+            .filter(pk=cart_id) \
+            .first()
+
+    def delete(self, cart_id):
+        Cart.objects.filter(pk=cart_id).delete()
+
+    def exists(self, cart_id):
+        return Cart.objects.filter(pk=cart_id).exists()
+
+    def get_items(self, cart_id):
+        return list(CartItem.objects.filter(cart_id=cart_id).select_related('product', 'variation'))
+
+    def get_item(self, cart_id, item_id):
+        return CartItem.objects.filter(cart_id=cart_id, pk=item_id).select_related('product', 'variation').first()
+
+    def _upsert(self, rows):
+        # inserts (cart_id, product_id, variation_id, quantity) rows, adding
+        # to the quantity of the ones already in the cart, capped at what the
+        # column holds
+        table = connection.ops.quote_name(CartItem._meta.db_table)
+        values = ', '.join(['(%s, %s, %s, %s)'] * rows)
+        insert = f'INSERT INTO {table} (cart_id, product_id, variation_id, quantity) VALUES {values}'
+        if connection.vendor == 'mysql':
+            # no RETURNING: LAST_INSERT_ID(id) hands back the updated row's id
+            return f'{insert} ON DUPLICATE KEY UPDATE quantity = LEAST(quantity + VALUES(quantity), {MAX_QUANTITY}), ' \
+                'variation_id = VALUES(variation_id), id = LAST_INSERT_ID(id)'
+        least = 'MIN' if connection.vendor == 'sqlite' else 'LEAST'
+        return f'{insert} ON CONFLICT (cart_id, product_id) DO UPDATE SET ' \
+            f'quantity = {least}({table}.quantity + excluded.quantity, {MAX_QUANTITY}), variation_id = excluded.variation_id'
+
+    def _params(self, cart_id, product_id, variation, quantity):
+        cart_id = CartItem._meta.get_field('cart').get_db_prep_value(cart_id, connection)
+        return [cart_id, product_id, variation.pk if variation else None, quantity]
+
+    def add_item(self, cart_id, product_id, variation, quantity):
+        """
+        Adds `quantity` to the cart's line for the product in one upsert, so
+        concurrent adds of the same product can't race into the (cart,
+        product) unique constraint.
+        """
+        params = self._params(cart_id, product_id, variation, quantity)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(self._upsert(1), params)
+                item_id = cursor.lastrowid
+                if cursor.rowcount != 1:
+                    quantity = CartItem.objects.values_list('quantity', flat=True).get(pk=item_id)
+            else:
+                cursor.execute(f'{self._upsert(1)} RETURNING id, quantity', params)
+                item_id, quantity = cursor.fetchone()
+        return CartItem(id=item_id, cart_id=cart_id, product_id=product_id, variation=variation, quantity=quantity)
+
+    def apply(self, cart_id, operations):
+        """
+        Applies add/update/remove operations, at most one per product, with
+        one statement per kind of operation.
+        """
+        if not Cart.objects.filter(pk=cart_id).exists():
+            raise NotFound('No cart with the given ID was found.')
+        adds = [operation for operation in operations if operation['action'] == 'add']
+        updates = {operation['product_id']: operation['quantity'] for operation in operations if operation['action'] == 'update'}
+        removes = [operation['product_id'] for operation in operations if operation['action'] == 'remove']
+        with transaction.atomic():
+            if removes:
+                CartItem.objects.filter(cart_id=cart_id, product_id__in=removes).delete()
+            if updates:
+                CartItem.objects \
+                    .filter(cart_id=cart_id, product_id__in=updates) \
+                    .update(quantity=Case(
+                        *[When(product_id=product_id, then=Value(quantity)) for product_id, quantity in updates.items()],
+                        output_field=CartItem._meta.get_field('quantity')))
+            if adds:
+                params = [
+                    param
+                    for operation in adds
+                    for param in self._params(cart_id, operation['product_id'], operation.get('variation'), operation['quantity'])
+                ]
+                with connection.cursor() as cursor:
+                    cursor.execute(self._upsert(len(adds)), params)
+
+    def update_item(self, cart_item, quantity):
+        cart_item.quantity = quantity
+        cart_item.save(update_fields=['quantity'])
+        return cart_item
+
+    def remove_item(self, cart_item):
+        cart_item.delete()
+
+    def discard(self, cart_id):
+        # part of the caller's transaction, so a failed order keeps its cart
+        self.delete(cart_id)
+
+
+class RedisCartStorage:
+    """
+    Keeps each cart in a Redis hash that expires CART_TTL seconds after it
+    was last used, so carts that are never checked out never reach the
+    database. The hash holds `created_at` plus `<product_id>:quantity` and
+    `<product_id>:variation` per item; a cart holds a product once, so the
+    product id doubles as the item id.
+
+    Orders are built straight from the hash, which CreateOrderSerializer
+    drops once the order commits.
+    """
+
+    def __init__(self, url=None):
+        self.url = url
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = redis.Redis.from_url(self.url or settings.CART_REDIS_URL)
+        return self._connection
+
+    def _key(self, cart_id):
+        try:
+            return f'cart:{UUID(str(cart_id))}'
+        except ValueError:
+            return None
+
+    def _load(self, cart_id):
+        key = self._key(cart_id)
+        if key is None:
+            return None
+        pipeline = self.connection.pipeline()
+        pipeline.hgetall(key)
+        pipeline.expire(key, CART_TTL)
+        values, _ = pipeline.execute()
+        created_at = values.pop(b'created_at', None)
+        if created_at is None:
+            return None
+
+        created_at = parse_datetime(created_at.decode())
+        lines = {}
+        for field, value in values.items():
+            product_id, name = field.decode().split(':')
+            lines.setdefault(int(product_id), {})[name] = int(value) if value else None
+
+        products = Product.objects.in_bulk(lines)
+        variations = ProductVariation.objects.in_bulk(
+            [line['variation'] for line in lines.values() if line.get('variation')])
+        cart = Cart(id=UUID(str(cart_id)), created_at=created_at)
+        items = [
+            CartItem(
+                id=product_id,
+                cart=cart,
+                product=products[product_id],
+                variation=variations.get(line.get('variation')),
+                quantity=line['quantity'])
+            for product_id, line in sorted(lines.items())
+            if product_id in products and line.get('quantity')
+        ]
+        return cart, items
+
+    def create(self):
+        cart = Cart(created_at=timezone.now())
+        key = self._key(cart.id)
+        pipeline = self.connection.pipeline()
+        pipeline.hset(key, 'created_at', cart.created_at.isoformat())
+        pipeline.expire(key, CART_TTL)
+        pipeline.execute()
+        return _with_items(cart, [])
+
+    def get(self, cart_id):
+        loaded = self._load(cart_id)
+        return _with_items(*loaded) if loaded else None
+
+    def delete(self, cart_id):
+        key = self._key(cart_id)
+        if key is not None:
+            self.connection.delete(key)
+
+    def exists(self, cart_id):
+        key = self._key(cart_id)
+        return key is not None and bool(self.connection.exists(key))
+
+    def get_items(self, cart_id):
+        loaded = self._load(cart_id)
+        return loaded[1] if loaded else []
+
+    def get_item(self, cart_id, item_id):
+        return next((item for item in self.get_items(cart_id) if str(item.id) == str(item_id)), None)
+
+    def add_item(self, cart_id, product_id, variation, quantity):
+        key = self._key(cart_id)
+        if key is None or not self.connection.exists(key):
+            raise NotFound('No cart with the given ID was found.')
+        pipeline = self.connection.pipeline()
+        pipeline.hincrby(key, f'{product_id}:quantity', quantity)
+        pipeline.hset(key, f'{product_id}:variation', variation.pk if variation else '')
+        pipeline.expire(key, CART_TTL)
+        total, _, _ = pipeline.execute()
+        if total > MAX_QUANTITY:
+            total = MAX_QUANTITY
+            self.connection.hset(key, f'{product_id}:quantity', total)
+        return CartItem(id=product_id, cart_id=cart_id, product_id=product_id, variation=variation, quantity=total)
+
+    def update_item(self, cart_item, quantity):
+        key = self._key(cart_item.cart_id)
+        pipeline = self.connection.pipeline()
+        pipeline.hset(key, f'{cart_item.product_id}:quantity', quantity)
+        pipeline.expire(key, CART_TTL)
+        pipeline.execute()
+        cart_item.quantity = quantity
+        return cart_item
+
+    def apply(self, cart_id, operations):
+        key = self._key(cart_id)
+        fields = self.connection.hkeys(key) if key else []
+        if not fields:
+            raise NotFound('No cart with the given ID was found.')
+        fields = {field.decode() for field in fields}
+        pipeline = self.connection.pipeline()
+        adds = []
+        for operation in operations:
+            product_id = operation['product_id']
+            if operation['action'] == 'add':
+                variation = operation.get('variation')
+                adds.append((len(pipeline), product_id))
+                pipeline.hincrby(key, f'{product_id}:quantity', operation['quantity'])
+                pipeline.hset(key, f'{product_id}:variation', variation.pk if variation else '')
+            elif operation['action'] == 'update':
+                if f'{product_id}:quantity' in fields:
+                    pipeline.hset(key, f'{product_id}:quantity', operation['quantity'])
+            else:
+                pipeline.hdel(key, f'{product_id}:quantity', f'{product_id}:variation')
+        pipeline.expire(key, CART_TTL)
+        results = pipeline.execute()
+        capped = {f'{product_id}:quantity': MAX_QUANTITY for index, product_id in adds if results[index] > MAX_QUANTITY}
+        if capped:
+            self.connection.hset(key, mapping=capped)
+
+    def remove_item(self, cart_item):
+        self.connection.hdel(
+            self._key(cart_item.cart_id),
+            f'{cart_item.product_id}:quantity',
+            f'{cart_item.product_id}:variation')
+
+    def discard(self, cart_id):
+        transaction.on_commit(lambda: self.delete(cart_id))
+
+
+def purge_carts(max_age=None, batch_size=1000):
+    """
+    Deletes SQL carts created more than `max_age` seconds (CART_EXPIRY by
+    default) ago, oldest first, one short transaction per `batch_size`
+    carts. Returns the number of carts and cart items deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age or getattr(settings, 'CART_EXPIRY', 60 * 60 * 24 * 30))
+    expired = Cart.objects.filter(created_at__lt=cutoff).order_by('created_at')
+    carts = items = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            _, deleted = Cart.objects.filter(pk__in=ids).delete()
+        carts += deleted.get(Cart._meta.label, 0)
+        items += deleted.get(CartItem._meta.label, 0)
+    return carts, items
+
+
+_storages = {
+    'sql': SQLCartStorage(),
+    'redis': RedisCartStorage(),
+}
+
+
+def get_cart_storage():
+    return _storages[getattr(settings, 'CART_STORAGE', 'sql')]
@@ -0,0 +1,286 @@
+import csv
+import json
+from decimal import Decimal
+from itertools import islice
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+from .caching import invalidate
+from .inventory import set_stock
+from .listing import refresh_listings_on_commit
+from .models import Category, Product, ProductVariation, StockMovement
+from .search import SEARCH_FIELDS, get_search_backend
+
+
+PRODUCT_FIELDS = ['name', 'slug', 'shortDescription', 'fullDescription', 'price', 'discount', 'offerend', 'new', 'stock']
+VARIATION_FIELDS = ['sku', 'type', 'quantity', 'price', 'discount', 'stock']
+CATALOG_COLUMNS = ['sku'] + PRODUCT_FIELDS + ['categories'] + [f'variation_{field}' for field in VARIATION_FIELDS]
+CATEGORY_SEPARATOR = '|'
+
+
+def _bool(value):
+    return value if isinstance(value, bool) else str(value).strip().lower() in ['1', 'true', 'yes']
+
+
+def _datetime(value):
+    value = parse_datetime(str(value))
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+CONVERTERS = {
+    'price': lambda value: Decimal(str(value)),
+    'discount': lambda value: Decimal(str(value)),
+    'quantity': int,
+    'stock': int,
+    'new': _bool,
+    'offerend': _datetime,
+    'sku': str,
+}
+
+
+def _clean(field, value):
+    if value is None or value == '':
+        return None
+    return CONVERTERS.get(field, lambda value: value)(value)
+
+
+def _titles(value):
+    if isinstance(value, list):
+        return {str(title).strip() for title in value if str(title).strip()}
+    return {title.strip() for title in (value or '').split(CATEGORY_SEPARATOR) if title.strip()}
+
+
+def read_rows(file, format):
+    if format == 'csv':
+        yield from csv.DictReader(file)
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_rows(file, format, rows):
+    if format == 'csv':
+        writer = csv.DictWriter(file, fieldnames=CATALOG_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            file.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def export_rows(batch_size=1000):
+    """
+    One row per variation (or per product when it has none), streamed
+    with a fixed number of queries per `batch_size` products.
+    """
+    products = Product.objects.prefetch_related('variations', 'category').order_by('id')
+    for product in products.iterator(chunk_size=batch_size):
+        row = {field: getattr(product, field) for field in PRODUCT_FIELDS}
+        row['sku'] = product.sku
+        row['categories'] = CATEGORY_SEPARATOR.join(category.title for category in product.category.all())
+        for variation in product.variations.all() or [None]:
+            yield {
+                **row,
+                **{f'variation_{field}': getattr(variation, field) if variation else None for field in VARIATION_FIELDS},
+            }
+
+
+class CatalogImporter:
+    """
+    Upserts products by sku, their variations by variation sku (or type)
+    and replaces their category links, one transaction per chunk.
+
+    Bulk queries skip the model signals, so each chunk invalidates the
+    catalog cache, refreshes the listings and reindexes the products it
+    touched itself.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.ambiguous = set()
+
+    def run(self, rows):
+        for chunk in chunked(rows, self.batch_size):
+            with transaction.atomic():
+                self.import_chunk(chunk)
+            yield len(chunk)
+
+    def import_chunk(self, rows):
+        products, categories, variations = self.parse(rows)
+        product_ids = self.save_products(products)
+        self.save_categories(categories, product_ids)
+        self.save_variations(variations, product_ids)
+        self.save_stock(products, variations, product_ids)
+
+        touched = list(product_ids.values())
+        backend = get_search_backend()
+        for product in Product.objects.filter(id__in=touched).only(*SEARCH_FIELDS):
+            backend.update(product)
+        invalidate('products', 'categories', *[f'product:{product_id}' for product_id in touched])
+        refresh_listings_on_commit(touched)
+
+    def parse(self, rows):
+        products = {}
+        categories = {}
+        variations = {}
+        for row in rows:
+            sku = _clean('sku', row.get('sku'))
+            if sku is None:
+                self.skipped += 1
+                continue
+
+            values = products.setdefault(sku, {})
+            for field in PRODUCT_FIELDS:
+                if field in row:
+                    values[field] = _clean(field, row[field])
+            if 'categories' in row:
+                categories.setdefault(sku, set()).update(_titles(row['categories']))
+
+            variation = {
+                field: _clean(field, row[f'variation_{field}'])
+                for field in VARIATION_FIELDS
+                if f'variation_{field}' in row
+            }
+            key = variation.get('sku') or variation.get('type')
+            if key is not None:
+                variations[(sku, key)] = variation
+        return products, categories, variations
+
+    def save_products(self, products):
+        now = timezone.now()
+        existing = {}
+        ambiguous = set()
+        for product in Product.objects.filter(sku__in=products).order_by('id'):
+            if product.sku in existing:
+                ambiguous.add(product.sku)
+            existing.setdefault(product.sku, product)
+
+        to_create = []
+        to_update = []
+        update_fields = {'last_update'}
+        for sku, values in products.items():
+            if sku in ambiguous:
+                # several products share the sku, so there's no telling which one the row means
+                self.ambiguous.add(sku)
+                self.skipped += 1
+                continue
+            product = existing.get(sku)
+            if product is None:
+                values = {'stock': 0, 'new': False, **{field: value for field, value in values.items() if value is not None}}
+                if not values.get('name') or values.get('price') is None:
+                    self.skipped += 1
+                    continue
+                values.setdefault('slug', slugify(values['name']))
+                to_create.append(Product(sku=sku, **values))
+                continue
+
+            for field, value in values.items():
+                if value is None and not Product._meta.get_field(field).null:
+                    continue
+                setattr(product, field, value)
+                update_fields.add(field)
+            product.last_update = now
+            to_update.append(product)
+
+        Product.objects.bulk_create(to_create)
+        Product.objects.bulk_update(to_update, list(update_fields))
+        self.created += len(to_create)
+        self.updated += len(to_update)
+
+        # bulk_create doesn't set primary keys on MySQL, so read them back
+        product_ids = {}
+        for product_id, sku in Product.objects.filter(sku__in=products.keys() - ambiguous).values_list('id', 'sku'):
+            product_ids[sku] = product_id
+        return product_ids
+
+    def save_categories(self, categories, product_ids):
+        categories = {sku: titles for sku, titles in categories.items() if sku in product_ids}
+        if not categories:
+            return
+
+        titles = set().union(*categories.values())
+        category_ids = dict(Category.objects.filter(title__in=titles).values_list('title', 'id'))
+        missing = titles - category_ids.keys()
+        if missing:
+            Category.objects.bulk_create([Category(title=title) for title in missing])
+            category_ids.update(Category.objects.filter(title__in=missing).values_list('title', 'id'))
+
+        through = Product.category.through
+        links = through.objects.filter(product_id__in=[product_ids[sku] for sku in categories])
+        # bulk relinking skips m2m_changed, so touch the categories on both
+        # sides to move their Last-Modified / ETag validators
+        touched = set(links.values_list('category_id', flat=True)) | {category_ids[title] for title in titles}
+        links.delete()
+        through.objects.bulk_create([
+            through(product_id=product_ids[sku], category_id=category_ids[title])
+            for sku, titles in categories.items()
+            for title in titles
+        ])
+        Category.objects.filter(pk__in=touched).update(last_update=timezone.now())
+
+    def save_stock(self, products, variations, product_ids):
+        # bulk writes skip the signals that record ledger adjustments
+        targets = {
+            (product_ids[sku], None): values['stock']
+            for sku, values in products.items()
+            if sku in product_ids and values.get('stock') is not None
+        }
+        tracked = [(sku, key, values['stock']) for (sku, key), values in variations.items()
+                   if sku in product_ids and values.get('stock') is not None]
+        if tracked:
+            lookup = {}
+            for variation in ProductVariation.objects.filter(product_id__in=[product_ids[sku] for sku, _, _ in tracked]):
+                if variation.sku:
+                    lookup.setdefault((variation.product_id, variation.sku), variation.pk)
+                lookup.setdefault((variation.product_id, variation.type), variation.pk)
+            for sku, key, stock in tracked:
+                targets[product_ids[sku], lookup[product_ids[sku], key]] = stock
+        set_stock(targets, StockMovement.REASON_IMPORT)
+
+    def save_variations(self, variations, product_ids):
+        variations = {(sku, key): values for (sku, key), values in variations.items() if sku in product_ids}
+        if not variations:
+            return
+
+        existing = {}
+        for variation in ProductVariation.objects.filter(product_id__in=product_ids.values()):
+            if variation.sku:
+                existing.setdefault((variation.product_id, variation.sku), variation)
+            existing.setdefault((variation.product_id, variation.type), variation)
+
+        to_create = []
+        to_update = []
+        update_fields = set()
+        for (sku, key), values in variations.items():
+            product_id = product_ids[sku]
+            variation = existing.get((product_id, key))
+            if variation is None:
+                values = {field: value for field, value in values.items() if value is not None}
+                values.setdefault('type', key)
+                to_create.append(ProductVariation(product_id=product_id, **values))
+                continue
+
+            for field, value in values.items():
+                if value is None and not ProductVariation._meta.get_field(field).null:
+                    continue
+                setattr(variation, field, value)
+                update_fields.add(field)
+            to_update.append(variation)
+
+        ProductVariation.objects.bulk_create(to_create)
+        if update_fields:
+            ProductVariation.objects.bulk_update(to_update, list(update_fields))
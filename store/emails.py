@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from core.outbox import queue_email
 from django.conf import settings
 from django.urls import reverse
 
@@ -27,7 +27,7 @@ def send_order_confirmation_email(order):
     from_email = settings.DEFAULT_FROM_EMAIL
     recipient_list = [order.billing_address.email]
     html_message = f'<html><body style="font-family: Arial">{message}</body></html>'
-    send_mail(subject, message, from_email, recipient_list, html_message=html_message)
+    queue_email(subject, message, from_email, recipient_list, html_message=html_message)
 
 
 
@@ -52,4 +52,4 @@ def send_order_alert_to_admin(order):
     from_email = settings.DEFAULT_FROM_EMAIL
     recipient_list = ['info@treatnaturally.co.uk']
     html_message = f'<html><body style="font-family: Arial;">{message}</body></html>'
-    send_mail(subject, message, from_email, recipient_list, html_message=html_message)
\ No newline at end of file
+    queue_email(subject, message, from_email, recipient_list, html_message=html_message)
\ No newline at end of file
@@ -0,0 +1,77 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Case, CharField, Count, Value, When
+from django.db.models.functions import Cast
+from ailments.models import AilmentItem
+from tags.models import TaggedItem
+from .models import Product
+
+
+FACETS = ['category', 'ailment', 'tag', 'price']
+
+PRICE_BANDS = [(0, 10), (10, 25), (25, 50), (50, 100), (100, None)]
+
+
+def price_band_label(lower, upper):
+    return f'{lower}-{upper}' if upper is not None else f'{lower}+'
+
+
+def _category_counts(product_ids):
+    return Product.category.through.objects \
+        .filter(product_id__in=product_ids) \
+        .values(facet=Value('category'), value=Cast('category_id', CharField())) \
+        .annotate(count=Count('product_id', distinct=True))
+
+
+def _generic_counts(model, facet, related_field, product_ids):
+    return model.objects \
+        .filter(content_type=ContentType.objects.get_for_model(Product), object_id__in=product_ids) \
+        .values(facet=Value(facet), value=Cast(related_field, CharField())) \
+        .annotate(count=Count('object_id', distinct=True))
+
+
+def _price_counts(product_ids):
+    bands = [
+        When(
+            price__gte=lower,
+            **({'price__lt': upper} if upper is not None else {}),
+            then=Value(price_band_label(lower, upper)))
+        for lower, upper in PRICE_BANDS
+    ]
+    return Product.objects \
+        .filter(id__in=product_ids) \
+        .values(facet=Value('price'), value=Case(*bands, output_field=CharField())) \
+        .annotate(count=Count('id'))
+
+
+def facet_counts(queryset, facets):
+    """
+    Counts for every requested facet over the products in `queryset`,
+    computed in a single UNION ALL query.
+    """
+    product_ids = queryset.order_by().values('id')
+    builders = {
+        'category': lambda: _category_counts(product_ids),
+        'ailment': lambda: _generic_counts(AilmentItem, 'ailment', 'ailment_id', product_ids),
+        'tag': lambda: _generic_counts(TaggedItem, 'tag', 'tag_id', product_ids),
+        'price': lambda: _price_counts(product_ids),
+    }
+    queries = [builders[facet]().order_by() for facet in facets]
+    if not queries:
+        return {}
+
+    counts = {facet: [] for facet in facets}
+    for row in queries[0].union(*queries[1:], all=True):
+        value = row['value']
+        if value is None:
+            continue
+        if row['facet'] != 'price':
+            value = int(value)
+        counts[row['facet']].append({'value': value, 'count': row['count']})
+
+    labels = [price_band_label(lower, upper) for lower, upper in PRICE_BANDS]
+    if 'price' in counts:
+        counts['price'].sort(key=lambda band: labels.index(band['value']))
+    for facet in facets:
+        if facet != 'price':
+            counts[facet].sort(key=lambda item: item['value'])
+    return counts
@@ -1,13 +1,34 @@
 from django import forms
 import django_filters
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
 from .models import Product, Category
+from .search import get_search_backend
+
+
+class ProductSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+
+        queryset = get_search_backend().search(queryset, query)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-search_rank', 'id')
+        return queryset
+
 
 class ProductFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr='icontains')
+    name = django_filters.CharFilter(method='filter_name')
     category = django_filters.ModelMultipleChoiceFilter(
         queryset=Category.objects.all(),
         widget=forms.CheckboxSelectMultiple)
+    ailment = django_filters.NumberFilter(field_name='ailment_items__ailment_id')
+    tag = django_filters.NumberFilter(field_name='tagged_items__tag_id')
 
     class Meta:
         model = Product
-        fields = ['category', 'name']
\ No newline at end of file
+        fields = ['category', 'name', 'ailment', 'tag']
+
+    def filter_name(self, queryset, name, value):
+        return get_search_backend().search(queryset, value, fields=['name'])
\ No newline at end of file
@@ -0,0 +1,190 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .caching import invalidate
+from .listing import refresh_listings_on_commit
+from .models import Product, ProductVariation, StockMovement, StockSnapshot, stock_key
+
+
+class InsufficientStock(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'insufficient_stock'
+
+    def __init__(self, shortages):
+        super().__init__('Insufficient stock.')
+        self.shortages = shortages
+        # kept as is so quantities stay numbers in the response
+        self.detail = {'detail': self.detail, 'items': shortages}
+
+
+def stock_item(product, variation=None):
+    # a variation with its own stock is tracked instead of the product
+    if variation is not None and variation.stock is not None:
+        return product.pk, variation.pk
+    return product.pk, None
+
+
+def stock_levels(items, lock=False):
+    """
+    Current stock for (product_id, variation_id) pairs: the snapshot plus
+    the movements recorded since, in two queries. With `lock` the
+    snapshot rows stay locked until the transaction ends, which is what
+    serializes writers of the same item.
+    """
+    keys = {stock_key(*item): item for item in items}
+    snapshots = StockSnapshot.objects.filter(key__in=keys).order_by('id')
+    if lock:
+        snapshots = snapshots.select_for_update()
+    levels = {item: 0 for item in keys.values()}
+    pending = Q()
+    for snapshot in snapshots:
+        levels[keys[snapshot.key]] = snapshot.stock
+        pending |= Q(key=snapshot.key, id__gt=snapshot.last_movement_id)
+    if pending:
+        deltas = StockMovement.objects.filter(pending).values('key').annotate(total=Sum('delta'))
+        for row in deltas:
+            levels[keys[row['key']]] += row['total']
+    return levels
+
+
+def _record(deltas, reason, order=None):
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            key=stock_key(product_id, variation_id),
+            product_id=product_id,
+            variation_id=variation_id,
+            delta=delta,
+            reason=reason,
+            order=order)
+        for (product_id, variation_id), delta in deltas.items()
+        if delta
+    ])
+
+
+def reserve_stock(lines, order=None):
+    """
+    Records an order movement for every (product, variation, quantity)
+    line, batched into one insert.
+
+    The snapshot rows of the items involved are locked first so two
+    concurrent orders can't both take the last unit, while the product
+    rows themselves are never written. If any line falls short nothing is
+    recorded and InsufficientStock lists every shortage.
+
+    Once the transaction commits, the items are compacted so the catalog
+    shows the new levels without waiting for compact_inventory.
+    """
+    quantities = Counter()
+    for product, variation, quantity in lines:
+        quantities[stock_item(product, variation)] += quantity
+
+    # no savepoint: a shortage aborts the caller's transaction anyway
+    with transaction.atomic(savepoint=False):
+        levels = stock_levels(quantities, lock=True)
+        shortages = [
+            {'product_id': product_id, 'variation_id': variation_id, 'requested': requested, 'available': levels[product_id, variation_id]}
+            for (product_id, variation_id), requested in quantities.items()
+            if levels[product_id, variation_id] < requested
+        ]
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        _record({item: -requested for item, requested in quantities.items()}, StockMovement.REASON_ORDER, order)
+
+    keys = [stock_key(*item) for item in quantities]
+    # robust: the order is committed, a failure here leaves it to compact_inventory
+    transaction.on_commit(lambda: compact_stock(keys=keys), robust=True)
+
+
+def set_stock(targets, reason=StockMovement.REASON_ADJUSTMENT):
+    """
+    Brings {(product_id, variation_id): stock} items to the given levels
+    by recording the difference as a movement.
+    """
+    if not targets:
+        return
+    with transaction.atomic():
+        StockSnapshot.objects.bulk_create(
+            [
+                StockSnapshot(key=stock_key(product_id, variation_id), product_id=product_id, variation_id=variation_id)
+                for product_id, variation_id in targets
+            ],
+            ignore_conflicts=True)
+        levels = stock_levels(targets, lock=True)
+        _record({item: stock - levels[item] for item, stock in targets.items()}, reason)
+
+
+def compact_stock(batch_size=500, keys=None):
+    """
+    Folds the movements recorded since each snapshot (only the ones for
+    `keys`, if given) into it and writes the result to Product.stock /
+    ProductVariation.stock, which is what the catalog reads. Returns the
+    number of snapshots updated.
+    """
+    upto = StockMovement.objects.aggregate(last=Max('id'))['last']
+    if upto is None:
+        return 0
+
+    snapshots = StockSnapshot.objects.all() if keys is None else StockSnapshot.objects.filter(key__in=keys)
+    pending_ids = snapshots \
+        .filter(last_movement_id__lt=upto) \
+        .annotate(delta=_pending_delta(upto)) \
+        .filter(delta__isnull=False) \
+        .values_list('id', flat=True)
+
+    compacted = 0
+    batch = []
+    for snapshot_id in pending_ids.iterator(chunk_size=batch_size):
+        batch.append(snapshot_id)
+        if len(batch) == batch_size:
+            compacted += _compact_batch(batch, upto)
+            batch = []
+    if batch:
+        compacted += _compact_batch(batch, upto)
+    return compacted
+
+
+def _pending_delta(upto):
+    return Subquery(StockMovement.objects
+        .filter(key=OuterRef('key'), id__gt=OuterRef('last_movement_id'), id__lte=upto)
+        .values('key')
+        .annotate(total=Sum('delta'))
+        .values('total'))
+
+
+def _compact_batch(snapshot_ids, upto):
+    with transaction.atomic():
+        # locked first and summed after, so nothing committed in between is missed
+        snapshots = list(StockSnapshot.objects
+            .select_for_update()
+            .filter(id__in=snapshot_ids)
+            .order_by('id'))
+        deltas = dict(StockSnapshot.objects
+            .filter(id__in=snapshot_ids)
+            .annotate(delta=_pending_delta(upto))
+            .values_list('id', 'delta'))
+        now = timezone.now()
+        for snapshot in snapshots:
+            snapshot.stock += deltas.get(snapshot.id) or 0
+            snapshot.last_movement_id = upto
+            snapshot.taken_at = now
+        StockSnapshot.objects.bulk_update(snapshots, ['stock', 'last_movement_id', 'taken_at'])
+
+        Product.objects.bulk_update(
+            [Product(pk=snapshot.product_id, stock=max(snapshot.stock, 0))
+             for snapshot in snapshots if snapshot.variation_id is None],
+            ['stock'])
+        ProductVariation.objects.bulk_update(
+            [ProductVariation(pk=snapshot.variation_id, stock=max(snapshot.stock, 0))
+             for snapshot in snapshots if snapshot.variation_id is not None],
+            ['stock'])
+
+        # bulk updates skip the model signals that keep these in step
+        product_ids = {snapshot.product_id for snapshot in snapshots}
+        Product.objects.filter(pk__in=product_ids).update(last_update=now)
+        invalidate('products', *[f'product:{pk}' for pk in product_ids])
+        refresh_listings_on_commit(product_ids)
+    return len(snapshots)
@@ -0,0 +1,172 @@
+import threading
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+from core.images import variant_urls
+from ailments.models import AilmentItem
+from tags.models import TaggedItem
+from .caching import invalidate
+from .models import Product, ProductListing
+from .pricing import PricingEngine
+
+
+LISTING_FIELDS = [
+    'name', 'slug', 'shortDescription', 'fullDescription', 'price', 'discount',
+    'offerend', 'effective_price', 'is_discounted', 'new', 'stock', 'images',
+    'variations', 'categories', 'category_ids', 'tag_ids', 'ailment_ids', 'last_update',
+]
+
+
+def _image_url(image):
+    return image.url if image else None
+
+
+def _generic_ids(model, related_field, product_ids):
+    content_type = ContentType.objects.get_for_model(Product)
+    ids = defaultdict(list)
+    items = model.objects \
+        .filter(content_type=content_type, object_id__in=product_ids) \
+        .values_list('object_id', related_field)
+    for object_id, related_id in items:
+        ids[object_id].append(related_id)
+    return ids
+
+
+def _build_listing(product, price, tag_ids, ailment_ids):
+    categories = [{'id': category.id, 'title': category.title} for category in product.category.all()]
+    return ProductListing(
+        product=product,
+        name=product.name,
+        slug=product.slug,
+        shortDescription=product.shortDescription,
+        fullDescription=product.fullDescription,
+        price=product.price,
+        discount=product.discount,
+        offerend=product.offerend,
+        effective_price=price,
+        is_discounted=price < product.price,
+        new=product.new,
+        stock=product.stock,
+        images=[
+            {'id': image.id, 'image': _image_url(image.image), 'variants': variant_urls(image.variants)}
+            for image in product.images.all()
+        ],
+        variations=[
+            {
+                'id': variation.id,
+                'sku': variation.sku,
+                'quantity': variation.quantity,
+                'type': variation.type,
+                'price': variation.price,
+                'stock': variation.stock,
+                'image': _image_url(variation.image),
+                'variants': variant_urls(variation.variants),
+            }
+            for variation in product.variations.all()
+        ],
+        categories=categories,
+        category_ids=[category['id'] for category in categories],
+        tag_ids=tag_ids.get(product.id, []),
+        ailment_ids=ailment_ids.get(product.id, []),
+        last_update=product.last_update,
+    )
+
+
+def build_listings(product_ids=None, batch_size=500):
+    """
+    Rebuild the listing rows for `product_ids` (every product if None)
+    with a fixed number of queries per batch. Returns the rows written.
+    """
+    products = Product.objects.prefetch_related('images', 'variations', 'category').order_by('id')
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+
+    unique_fields = ['product'] if connection.features.supports_update_conflicts_with_target else None
+    written = 0
+    batch = []
+    for product in products.iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) == batch_size:
+            written += _write_batch(batch, unique_fields)
+            batch = []
+    if batch:
+        written += _write_batch(batch, unique_fields)
+    return written
+
+
+def _write_batch(products, unique_fields):
+    ids = [product.id for product in products]
+    tag_ids = _generic_ids(TaggedItem, 'tag_id', ids)
+    ailment_ids = _generic_ids(AilmentItem, 'ailment_id', ids)
+    # the public price: memberships and coupons only apply to cart and order lines
+    prices = PricingEngine().unit_prices([(product, None) for product in products])
+    listings = [_build_listing(product, price, tag_ids, ailment_ids) for product, price in zip(products, prices)]
+    ProductListing.objects.bulk_create(
+        listings,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=LISTING_FIELDS)
+    return len(listings)
+
+
+_pending = threading.local()
+
+
+def refresh_listings_on_commit(product_ids):
+    # Collect ids for the whole transaction so an admin save with inlines
+    # rebuilds each product once. Every call registers a callback; the
+    # first one to run drains the set and the rest are no-ops, which also
+    # keeps ids left behind by a rolled back transaction from being lost.
+    pending = getattr(_pending, 'product_ids', None)
+    if pending is None:
+        pending = _pending.product_ids = set()
+    pending.update(product_ids)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    product_ids = getattr(_pending, 'product_ids', None)
+    if product_ids:
+        _pending.product_ids = set()
+        build_listings(product_ids)
+
+
+def expire_offers(now=None):
+    """
+    Rebuilds the listings still marked discounted after their offer ended
+    and touches their products, so cached responses and validators move
+    too. Returns the number of products.
+    """
+    now = now or timezone.now()
+    product_ids = list(ProductListing.objects
+        .filter(is_discounted=True, offerend__lte=now)
+        .values_list('product_id', flat=True))
+    if product_ids:
+        with transaction.atomic():
+            Product.objects.filter(pk__in=product_ids).update(last_update=now)
+            invalidate('products', *[f'product:{product_id}' for product_id in product_ids])
+            # after the invalidation, so the unit prices are computed afresh
+            transaction.on_commit(lambda: build_listings(product_ids))
+    return len(product_ids)
+
+
+# serializer fields that don't share a name with their listing column
+SERIALIZER_COLUMNS = {'id': 'product_id', 'category': 'categories', 'price_with_tax': 'effective_price'}
+
+
+def get_listings(product_ids, fields=None):
+    """
+    Listing rows for `product_ids`, in the same order, building any that
+    are missing. `fields` limits the columns loaded to the ones the given
+    serializer fields need.
+    """
+    queryset = ProductListing.objects.all()
+    if fields is not None:
+        queryset = queryset.only(*{SERIALIZER_COLUMNS.get(field, field) for field in fields})
+    listings = queryset.in_bulk(product_ids)
+    missing = [product_id for product_id in product_ids if product_id not in listings]
+    if missing:
+        build_listings(missing)
+        listings.update(queryset.in_bulk(missing))
+    return [listings[product_id] for product_id in product_ids if product_id in listings]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from store.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the "frequently bought together" product recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        written = build_recommendations(top_n=options['top'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} product recommendations.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store.inventory import compact_stock
+
+
+class Command(BaseCommand):
+    help = 'Folds recent stock movements into the inventory snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        compacted = compact_stock(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Compacted {compacted} stock snapshots.'))
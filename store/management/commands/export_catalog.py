@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from store.catalog import export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Streams products, variations and categories to a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="output file, or '-' for stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+        file = self.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        started = time.monotonic()
+        rows = 0
+
+        def counted(rows_iterable):
+            nonlocal rows
+            for row in rows_iterable:
+                rows += 1
+                yield row
+
+        try:
+            write_rows(file, format, counted(export_rows(options['batch_size'])))
+        finally:
+            if file is not self.stdout:
+                file.close()
+
+        if file is not self.stdout:
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Exported {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s).'))
@@ -0,0 +1,38 @@
+import sys
+import time
+from django.core.management.base import BaseCommand
+from store.catalog import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upserts products, variations and category links from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        importer = CatalogImporter(batch_size=options['batch_size'])
+
+        file = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        started = time.monotonic()
+        rows = 0
+        try:
+            for count in importer.run(read_rows(file, format)):
+                rows += count
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{rows} rows ({rows / max(elapsed, 1e-9):.0f} rows/s)')
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s): '
+            f'{importer.created} products created, {importer.updated} updated, {importer.skipped} skipped.'))
+        if importer.ambiguous:
+            self.stderr.write(
+                f'Skipped rows for skus shared by several products: {", ".join(sorted(importer.ambiguous))}')
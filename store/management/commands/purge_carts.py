@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from store.carts import purge_carts
+
+
+class Command(BaseCommand):
+    help = 'Deletes database carts older than CART_EXPIRY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, help='in seconds, defaults to CART_EXPIRY')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        carts, items = purge_carts(max_age=options['max_age'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {carts} carts and {items} cart items.'))
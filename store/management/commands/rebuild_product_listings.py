@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from store.listing import build_listings
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalized product listing table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        product_ids = options['product_ids'] or None
+        written = build_listings(product_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} product listings.'))
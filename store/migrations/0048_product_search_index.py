@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE `store_product` '
+            'ADD FULLTEXT INDEX `store_product_search` (`name`, `shortDescription`, `fullDescription`), '
+            'ADD FULLTEXT INDEX `store_product_name_search` (`name`)')
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE store_product_fts "
+            "USING fts5(name, shortDescription, fullDescription, prefix='2 3')")
+        schema_editor.execute(
+            "INSERT INTO store_product_fts (rowid, name, shortDescription, fullDescription) "
+            "SELECT id, name, COALESCE(shortDescription, ''), COALESCE(fullDescription, '') FROM store_product")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE `store_product` '
+            'DROP INDEX `store_product_search`, '
+            'DROP INDEX `store_product_name_search`')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE store_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0047_alter_customer_interests"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0049_order_store_order_placed__61eeee_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='last_update',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:23
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0050_category_last_update'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='store.product')),
+                ('name', models.CharField(max_length=255)),
+                ('slug', models.SlugField()),
+                ('shortDescription', models.TextField(blank=True, null=True)),
+                ('fullDescription', models.TextField(blank=True, null=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('discount', models.DecimalField(blank=True, decimal_places=0, max_digits=3, null=True)),
+                ('offerend', models.DateTimeField(blank=True, null=True)),
+                ('effective_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('is_discounted', models.BooleanField(default=False)),
+                ('new', models.BooleanField(default=False)),
+                ('stock', models.IntegerField()),
+                ('images', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('variations', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('categories', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('category_ids', models.JSONField(default=list)),
+                ('tag_ids', models.JSONField(default=list)),
+                ('ailment_ids', models.JSONField(default=list)),
+                ('last_update', models.DateTimeField()),
+            ],
+        ),
+    ]
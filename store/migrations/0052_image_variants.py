@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0051_productlisting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='variants',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productvariation',
+            name='variants',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
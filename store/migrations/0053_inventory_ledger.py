@@ -0,0 +1,64 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_snapshots(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductVariation = apps.get_model('store', 'ProductVariation')
+    StockSnapshot = apps.get_model('store', 'StockSnapshot')
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(key=f'{product_id}', product_id=product_id, stock=stock)
+            for product_id, stock in Product.objects.values_list('id', 'stock').iterator()
+        ],
+        batch_size=1000)
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(key=f'{product_id}:{variation_id}', product_id=product_id, variation_id=variation_id, stock=stock)
+            for variation_id, product_id, stock in ProductVariation.objects
+                .filter(stock__isnull=False)
+                .values_list('id', 'product_id', 'stock')
+                .iterator()
+        ],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0052_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('stock', models.IntegerField(default=0)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='store.product')),
+                ('variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='store.productvariation')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50)),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('order', 'Order'), ('adjustment', 'Adjustment'), ('import', 'Import')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='store.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='store.product')),
+                ('variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='store.productvariation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'id'], name='store_stock_key_6ceaaa_idx')],
+            },
+        ),
+        migrations.RunPython(create_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:10
+
+from django.db import migrations, models
+from django.db.models import Q
+import django.db.models.deletion
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def _lookup(ProductVariation, product_ids):
+    # the free text held a sku, a type or the variation's __str__
+    lookup = {}
+    for variation in ProductVariation.objects.filter(product_id__in=product_ids).select_related('product'):
+        keys = [variation.sku, variation.type, f'{variation.product.name} - {variation.quantity}', str(variation.quantity)]
+        for key in keys:
+            if key:
+                lookup.setdefault((variation.product_id, key.strip()), variation.pk)
+    return lookup
+
+
+def link_variations(apps, schema_editor):
+    ProductVariation = apps.get_model('store', 'ProductVariation')
+    for model_name in ['CartItem', 'OrderItem']:
+        model = apps.get_model('store', model_name)
+        items = list(model.objects
+            .exclude(variation__isnull=True)
+            .exclude(variation='')
+            .only('id', 'product_id', 'variation'))
+        lookup = _lookup(ProductVariation, {item.product_id for item in items})
+        for item in items:
+            item.variation_ref_id = lookup.get((item.product_id, item.variation.strip()))
+        if model_name == 'OrderItem':
+            # order history keeps the text, matched or not
+            for item in items:
+                item.variation_label = item.variation.strip()
+            model.objects.bulk_update(items, ['variation_ref', 'variation_label'], batch_size=1000)
+        else:
+            model.objects.bulk_update([item for item in items if item.variation_ref_id], ['variation_ref'], batch_size=1000)
+        unmatched = sum(1 for item in items if item.variation_ref_id is None)
+        if unmatched:
+            logger.warning('%d %s variations matched no ProductVariation', unmatched, model_name)
+
+
+def unlink_variations(apps, schema_editor):
+    for model_name in ['CartItem', 'OrderItem']:
+        model = apps.get_model('store', model_name)
+        items = model.objects.select_related('variation_ref')
+        if model_name == 'OrderItem':
+            items = items.filter(Q(variation_ref__isnull=False) | ~Q(variation_label=''))
+        else:
+            items = items.filter(variation_ref__isnull=False)
+        items = list(items)
+        for item in items:
+            label = getattr(item, 'variation_label', '')
+            item.variation = label or item.variation_ref.sku or item.variation_ref.type
+        model.objects.bulk_update(items, ['variation'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0054_productrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='variation_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.productvariation'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='variation_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.productvariation'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='variation_label',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(link_variations, unlink_variations),
+        migrations.RemoveField(
+            model_name='cartitem',
+            name='variation',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='variation',
+        ),
+        migrations.RenameField(
+            model_name='cartitem',
+            old_name='variation_ref',
+            new_name='variation',
+        ),
+        migrations.RenameField(
+            model_name='orderitem',
+            old_name='variation_ref',
+            new_name='variation',
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='variation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='store.productvariation'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='variation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orderitems', to='store.productvariation'),
+        ),
+    ]
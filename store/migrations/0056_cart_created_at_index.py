@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0055_item_variation_fk'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['created_at'], name='store_cart_created_bb94c8_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0056_cart_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['sku'], name='store_produ_sku_8a55cb_idx'),
+        ),
+    ]
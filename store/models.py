@@ -1,10 +1,14 @@
 from django.db import models
 from django.contrib import admin
 from django.conf import settings
+from django.contrib.contenttypes.fields import GenericRelation
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, FileExtensionValidator, MaxValueValidator
 from django.db import models
 from uuid import uuid4
 from decimal import Decimal
+from ailments.models import AilmentItem
+from tags.models import TaggedItem
 from .validators import validate_file_size, percentage_validator
 
 
@@ -13,6 +17,7 @@ class Category(models.Model):
     title = models.CharField(max_length=255)
     featured_product = models.ForeignKey(
         'Product', on_delete=models.SET_NULL, null=True, related_name='+', blank=True)
+    last_update = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.title
@@ -44,12 +49,43 @@ class Product(models.Model):
     last_update = models.DateTimeField(auto_now=True)
     category = models.ManyToManyField(
         Category, related_name='products')
+    ailment_items = GenericRelation(AilmentItem, related_query_name='product')
+    tagged_items = GenericRelation(TaggedItem, related_query_name='product')
 
     def __str__(self) -> str:
         return self.name
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['sku']),
+        ]
+
+class ProductListing(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    name = models.CharField(max_length=255)
+    slug = models.SlugField()
+    shortDescription = models.TextField(null=True, blank=True)
+    fullDescription = models.TextField(null=True, blank=True)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    discount = models.DecimalField(max_digits=3, decimal_places=0, null=True, blank=True)
+    offerend = models.DateTimeField(null=True, blank=True)
+    effective_price = models.DecimalField(max_digits=6, decimal_places=2)
+    is_discounted = models.BooleanField(default=False)
+    new = models.BooleanField(default=False)
+    stock = models.IntegerField()
+    images = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    variations = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    categories = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    category_ids = models.JSONField(default=list)
+    tag_ids = models.JSONField(default=list)
+    ailment_ids = models.JSONField(default=list)
+    last_update = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return self.name
+
 
 class ProductVariation(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variations')
@@ -60,6 +96,7 @@ class ProductVariation(models.Model):
     sku = models.CharField(max_length=255, null=True, blank=True)
     stock = models.IntegerField(validators=[MinValueValidator(0)], null=True, blank=True)
     image = models.ImageField(upload_to='store/images', validators=[validate_file_size], null=True, blank=True)
+    variants = models.JSONField(default=dict, editable=False)
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity}"
@@ -70,6 +107,60 @@ class ProductImage(models.Model):
     image = models.ImageField(
         upload_to='store/images',
         validators=[validate_file_size])
+    variants = models.JSONField(default=dict, editable=False)
+
+
+class ProductRecommendation(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_for')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        unique_together = [['product', 'rank']]
+
+
+def stock_key(product_id, variation_id=None):
+    return f'{product_id}:{variation_id}' if variation_id else f'{product_id}'
+
+
+class StockMovement(models.Model):
+    """
+    Append-only inventory ledger. Rows are never updated or deleted;
+    StockSnapshot folds them into a running total. Deleting a product or
+    variation only clears the foreign key, `key` still names the item.
+    """
+    REASON_ORDER = 'order'
+    REASON_ADJUSTMENT = 'adjustment'
+    REASON_IMPORT = 'import'
+    REASON_CHOICES = [
+        (REASON_ORDER, 'Order'),
+        (REASON_ADJUSTMENT, 'Adjustment'),
+        (REASON_IMPORT, 'Import'),
+    ]
+
+    key = models.CharField(max_length=50)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    variation = models.ForeignKey(ProductVariation, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    order = models.ForeignKey('Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'id']),
+        ]
+
+
+class StockSnapshot(models.Model):
+    key = models.CharField(max_length=50, unique=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_snapshots')
+    stock = models.IntegerField(default=0)
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
 
 
 class Interest(models.Model):
@@ -187,6 +278,10 @@ class Order(models.Model):
         permissions = [
             ('cancel_order', 'Can cancel order')
         ]
+        indexes = [
+            models.Index(fields=['placed_at', 'id']),
+            models.Index(fields=['customer', 'placed_at', 'id']),
+        ]
     def __str__(self):
         return self.billing_address.first_name + ' ' + self.billing_address.last_name + "'s order"
 
@@ -195,7 +290,9 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name='orderitems')
-    variation = models.CharField(max_length=255, null=True, blank=True)
+    variation = models.ForeignKey(ProductVariation, on_delete=models.SET_NULL, null=True, blank=True, related_name='orderitems')
+    # the variation as ordered, kept when the variation itself goes away
+    variation_label = models.CharField(max_length=255, blank=True)
     quantity = models.PositiveSmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
     final_price_after_discount = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
@@ -205,12 +302,17 @@ class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(
         Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    variation = models.CharField(max_length=255, null=True, blank=True)
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, null=True, blank=True)
     quantity = models.PositiveSmallIntegerField(
         validators=[MinValueValidator(1)]
     )
@@ -1,4 +1,135 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 class DefaultPagination(PageNumberPagination):
-  page_size = 10
\ No newline at end of file
+  page_size = 10
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seeks on a unique, indexed ordering instead of using OFFSET, so every
+    page costs the same. `ordering` must end in a unique field and all
+    fields must share one direction.
+
+    A single `?ordering=` field from the view's `ordering_fields` is
+    honoured, with `id` as the tie-breaker; relevance-ranked search
+    results can't be seeked and are rejected.
+    """
+    page_size = 10
+    cursor_query_param = 'cursor'
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, queryset, request, view):
+        requested = request.query_params.get(api_settings.ORDERING_PARAM)
+        if not requested:
+            if 'search_rank' in queryset.query.annotations:
+                raise ValidationError({'pagination': ['Search results are ranked by relevance and can only be paginated by page number.']})
+            return self.ordering
+        field = requested.lstrip('-')
+        if field not in (getattr(view, 'ordering_fields', None) or []):
+            raise ValidationError({api_settings.ORDERING_PARAM: [f"Can't paginate by cursor when ordering by '{requested}'."]})
+        return (requested, '-id' if requested.startswith('-') else 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.current_ordering = list(self.get_ordering(queryset, request, view))
+        position, reverse = self.decode_cursor(request)
+
+        fields = [field.lstrip('-') for field in self.current_ordering]
+        descending = self.current_ordering[0].startswith('-') != reverse
+        queryset = queryset.order_by(*[('-' if descending else '') + field for field in fields])
+        if position is not None:
+            queryset = queryset.filter(self.seek(fields, position, descending))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_position = self.get_position(results[-1], fields) if has_next and results else None
+        self.previous_position = self.get_position(results[0], fields) if has_previous and results else None
+        return results
+
+    def seek(self, fields, position, descending):
+        lookup = 'lt' if descending else 'gt'
+        condition = Q()
+        for index, field in enumerate(fields):
+            equal = {name: value for name, value in zip(fields[:index], position)}
+            condition |= Q(**equal, **{f'{field}__{lookup}': position[index]})
+        return condition
+
+    def get_position(self, instance, fields):
+        # isoformat() keeps microseconds, which DjangoJSONEncoder drops
+        return [
+            value.isoformat() if hasattr(value, 'isoformat') else str(value) if isinstance(value, Decimal) else value
+            for value in (getattr(instance, field) for field in fields)
+        ]
+
+    def encode_cursor(self, position, reverse):
+        if position is None:
+            return None
+        cursor = json.dumps({'p': position, 'r': reverse, 'o': self.current_ordering})
+        encoded = urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = cursor['p'], bool(cursor['r'])
+            # a cursor only makes sense for the ordering it was made for
+            if cursor['o'] != self.current_ordering or len(position) != len(self.current_ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_position, False)
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_position, True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ProductKeysetPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class OrderKeysetPagination(KeysetPagination):
+    ordering = ('-placed_at', '-id')
+
+
+class BlogPostKeysetPagination(KeysetPagination):
+    ordering = ('last_update', 'id')
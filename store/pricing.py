@@ -0,0 +1,104 @@
+from decimal import ROUND_HALF_UP, Decimal
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from .caching import CATALOG_CACHE_TIMEOUT, get_generations
+from .models import Coupon, Membership
+
+
+TAX_RATE = Decimal('0.1')
+CENT = Decimal('0.01')
+
+
+def quantize(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def with_tax(price):
+    return quantize(price * (1 + TAX_RATE))
+
+
+def apply_discount(price, discount):
+    return price * (100 - discount) / 100 if discount else price
+
+
+def get_membership(user):
+    if not user.is_authenticated:
+        return None
+    return Membership.objects.filter(customer__user_id=user.id).first()
+
+
+def get_coupon(code, today=None):
+    today = today or timezone.localdate()
+    return Coupon.objects \
+        .filter(coupon_code=code) \
+        .filter(Q(expiry_date__isnull=True) | Q(expiry_date__gte=today)) \
+        .first()
+
+
+class PricingEngine:
+    """
+    Prices products and cart/order lines in one pass.
+
+    Unit prices (variation price, product or variation discount, then
+    membership discount) are cached per membership discount and catalog
+    generation, so any product change orphans them; an entry also carries
+    the `offerend` it depends on and is recomputed once that has passed.
+    Coupons apply per request on top of the cached unit price.
+    """
+
+    def __init__(self, membership=None, coupon=None, now=None):
+        self.membership_discount = membership.discount if membership else Decimal(0)
+        self.coupon_discount = (coupon.discount or Decimal(0)) if coupon else Decimal(0)
+        self.now = now or timezone.now()
+
+    def _unit_price(self, product, variation):
+        price = variation.price if variation and variation.price else product.price
+        discount = None
+        valid_until = None
+        if variation and variation.discount:
+            discount = variation.discount
+        elif product.discount and (product.offerend is None or product.offerend > self.now):
+            discount = product.discount
+            valid_until = product.offerend
+        return quantize(apply_discount(apply_discount(price, discount), self.membership_discount)), valid_until
+
+    def unit_prices(self, items):
+        """Unit prices for a list of (product, variation) pairs, in order."""
+        generation, = get_generations(['products'])
+        keys = [
+            f'pricing:{self.membership_discount}:{generation}:{product.pk}:{variation.pk if variation else 0}'
+            for product, variation in items
+        ]
+        cached = cache.get_many(keys)
+        missing = {}
+        prices = []
+        for key, (product, variation) in zip(keys, items):
+            entry = missing.get(key) or cached.get(key)
+            if entry is None or (entry[1] is not None and entry[1] <= self.now):
+                entry = missing[key] = self._unit_price(product, variation)
+            prices.append(entry[0])
+        if missing:
+            cache.set_many(missing, CATALOG_CACHE_TIMEOUT)
+        return prices
+
+    def price_lines(self, lines):
+        """
+        Prices (product, variation, quantity) lines. Returns a list of
+        (unit_price, line_price) pairs and the total.
+        """
+        unit_prices = self.unit_prices([(product, variation) for product, variation, _ in lines])
+        priced = []
+        for unit_price, (_, _, quantity) in zip(unit_prices, lines):
+            unit_price = quantize(apply_discount(unit_price, self.coupon_discount))
+            priced.append((unit_price, unit_price * quantity))
+        return priced, sum((line_price for _, line_price in priced), Decimal(0))
+
+    def price_cart_items(self, cart_items):
+        """Line prices keyed by cart item id, plus the total."""
+        cart_items = list(cart_items)
+        priced, total = self.price_lines([
+            (item.product, item.variation, item.quantity)
+            for item in cart_items
+        ])
+        return {item.id: line for item, line in zip(cart_items, priced)}, total
@@ -0,0 +1,95 @@
+import numpy as np
+from django.db import transaction
+from .caching import invalidate
+from .models import OrderItem, ProductRecommendation
+
+
+# (product, related) pairs are encoded as product * SHIFT + related
+SHIFT = 1 << 32
+
+
+def _co_occurrences(orders, products):
+    """
+    Every ordered pair of distinct products bought in the same order, as
+    (left, right) arrays. `orders` must be sorted.
+    """
+    _, starts, lengths = np.unique(orders, return_index=True, return_counts=True)
+    group = np.repeat(np.arange(len(starts)), lengths)
+
+    # pair each item with every item of its own order
+    repeats = lengths[group]
+    left = np.repeat(np.arange(len(products)), repeats)
+    offsets = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    right = starts[group][left] + offsets
+
+    distinct = products[left] != products[right]
+    return products[left][distinct], products[right][distinct]
+
+
+def build_recommendations(top_n=10, batch_size=50000):
+    """
+    Rebuilds the "frequently bought together" table from order history.
+
+    Order lines are streamed in batches of whole orders and the pair
+    counts are kept as a sparse set of encoded (product, related) codes.
+    Products are ranked per product by co-purchase count and scored by
+    the share of that product's orders they appear in.
+    """
+    rows = OrderItem.objects \
+        .order_by('order_id', 'product_id') \
+        .values_list('order_id', 'product_id') \
+        .distinct() \
+        .iterator(chunk_size=batch_size)
+
+    codes = np.empty(0, dtype=np.int64)
+    counts = np.empty(0, dtype=np.int64)
+    order_counts = {}
+    batch = []
+    last_order = None
+
+    def flush(batch):
+        nonlocal codes, counts
+        pairs = np.array(batch, dtype=np.int64)
+        orders, products = pairs[:, 0], pairs[:, 1]
+        ids, totals = np.unique(products, return_counts=True)
+        for product_id, total in zip(ids.tolist(), totals.tolist()):
+            order_counts[product_id] = order_counts.get(product_id, 0) + total
+
+        left, right = _co_occurrences(orders, products)
+        batch_codes = left * SHIFT + right
+        merged, inverse = np.unique(np.concatenate([codes, batch_codes]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([counts, np.ones(len(batch_codes), dtype=np.int64)])).astype(np.int64)
+        codes = merged
+
+    for order_id, product_id in rows:
+        # only cut between orders so each order's pairs land in one batch
+        if len(batch) >= batch_size and order_id != last_order:
+            flush(batch)
+            batch = []
+        batch.append((order_id, product_id))
+        last_order = order_id
+    if batch:
+        flush(batch)
+
+    left = codes // SHIFT
+    right = codes % SHIFT
+    order = np.lexsort((right, -counts, left))
+    left, right, pair_counts = left[order], right[order], counts[order]
+    _, starts, lengths = np.unique(left, return_index=True, return_counts=True)
+    rank = np.arange(len(left)) - np.repeat(starts, lengths)
+    keep = rank < top_n
+
+    recommendations = [
+        ProductRecommendation(
+            product_id=product_id,
+            related_id=related_id,
+            score=count / order_counts[product_id],
+            rank=position + 1)
+        for product_id, related_id, count, position in zip(
+            left[keep].tolist(), right[keep].tolist(), pair_counts[keep].tolist(), rank[keep].tolist())
+    ]
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+        invalidate('recommendations')
+    return len(recommendations)
@@ -0,0 +1,183 @@
+import re
+from collections import Counter
+from functools import reduce
+from operator import add, or_
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from .models import Product
+
+
+SEARCH_FIELDS = ['name', 'shortDescription', 'fullDescription']
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+class MySQLSearchBackend:
+    """
+    Uses the FULLTEXT indexes created by the 0048 migration. InnoDB keeps
+    them up to date on commit, so there is nothing to do on save.
+    """
+
+    def search(self, queryset, query, fields=SEARCH_FIELDS):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+
+        columns = ', '.join(f'`store_product`.`{field}`' for field in fields)
+        against = ' '.join(f'+{term}*' for term in terms)
+        match = f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)'
+        return queryset \
+            .filter(id__in=RawSQL(f'SELECT `id` FROM `store_product` WHERE {match}', [against])) \
+            .annotate(search_rank=RawSQL(match, [against], output_field=FloatField()))
+
+    def update(self, product):
+        pass
+
+    def remove(self, product_id):
+        pass
+
+
+class SQLiteSearchBackend:
+    """
+    Uses the `store_product_fts` FTS5 table created by the 0048 migration,
+    which is kept in sync from the Product signals.
+    """
+    table = 'store_product_fts'
+
+    def search(self, queryset, query, fields=SEARCH_FIELDS):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+
+        expression = ' '.join(f'"{term}"*' for term in terms)
+        match = '{%s} : (%s)' % (' '.join(fields), expression)
+        return queryset \
+            .filter(id__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match])) \
+            .annotate(search_rank=RawSQL(
+                f'SELECT -rank FROM {self.table} WHERE {self.table} MATCH %s AND rowid = "store_product"."id"',
+                [match], output_field=FloatField()))
+
+    def update(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [product.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, {", ".join(SEARCH_FIELDS)}) VALUES (%s, %s, %s, %s)',
+                [product.pk] + [getattr(product, field) or '' for field in SEARCH_FIELDS])
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [product_id])
+
+
+class LikeSearchBackend:
+    """
+    Plain LIKE '%term%' matching for databases without a full-text index,
+    ranked by the number of fields each term matches.
+    """
+
+    def search(self, queryset, query, fields=SEARCH_FIELDS):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+
+        for term in terms:
+            queryset = queryset.filter(reduce(or_, [Q(**{f'{field}__icontains': term}) for field in fields]))
+        return queryset.annotate(search_rank=reduce(add, [
+            Case(When(**{f'{field}__icontains': term}, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+            for term in terms
+            for field in fields
+        ]))
+
+    def update(self, product):
+        pass
+
+    def remove(self, product_id):
+        pass
+
+
+class InMemorySearchBackend:
+    """
+    Process-local inverted index, built from the database on first use.
+    Only used when PRODUCT_SEARCH_BACKEND = 'memory': each process keeps
+    its own copy, so it goes stale across workers.
+    """
+
+    def __init__(self):
+        self.documents = None
+
+    def reset(self):
+        self.documents = None
+
+    def _tokens(self, product):
+        return {field: Counter(search_terms(getattr(product, field) or '')) for field in SEARCH_FIELDS}
+
+    def _build(self):
+        if self.documents is None:
+            self.documents = {
+                product.pk: self._tokens(product)
+                for product in Product.objects.only(*SEARCH_FIELDS).iterator()
+            }
+
+    def _score(self, document, terms, fields):
+        score = 0
+        for term in terms:
+            hits = sum(
+                count
+                for field in fields
+                for token, count in document[field].items()
+                if token.startswith(term))
+            if not hits:
+                return 0
+            score += hits
+        return score
+
+    def search(self, queryset, query, fields=SEARCH_FIELDS):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+
+        self._build()
+        scores = {}
+        for product_id, document in self.documents.items():
+            score = self._score(document, terms, fields)
+            if score:
+                scores[product_id] = score
+        if not scores:
+            return queryset.none()
+
+        return queryset \
+            .filter(id__in=scores.keys()) \
+            .annotate(search_rank=Case(
+                *[When(id=product_id, then=Value(float(score))) for product_id, score in scores.items()],
+                output_field=FloatField()))
+
+    def update(self, product):
+        if self.documents is not None:
+            self.documents[product.pk] = self._tokens(product)
+
+    def remove(self, product_id):
+        if self.documents is not None:
+            self.documents.pop(product_id, None)
+
+
+_backends = {
+    'mysql': MySQLSearchBackend(),
+    'sqlite': SQLiteSearchBackend(),
+    'like': LikeSearchBackend(),
+    'memory': InMemorySearchBackend(),
+}
+
+
+def get_search_backend():
+    name = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if name is None:
+        return _backends.get(connection.vendor, _backends['like'])
+    try:
+        return _backends[name]
+    except KeyError:
+        raise ImproperlyConfigured(f'Unknown PRODUCT_SEARCH_BACKEND {name!r}.')
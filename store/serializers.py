@@ -1,8 +1,34 @@
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
+from core.images import ImageVariantsField
+from core.tasks import deliver_outbox
 from .signals import order_created
-from .models import Cart, CartItem, Coupon, Customer, Order, OrderItem, Product, Category, ProductImage, Review, Interest, BillingAddress, OptionalShippingAddress, ProductVariation, Membership
+from .pricing import PricingEngine, get_coupon, with_tax
+from .carts import MAX_QUANTITY, get_cart_storage
+from .emails import send_order_alert_to_admin, send_order_confirmation_email
+from .inventory import reserve_stock
+from .models import Cart, CartItem, Coupon, Customer, Order, OrderItem, Product, Category, ProductImage, ProductListing, Review, Interest, BillingAddress, OptionalShippingAddress, ProductVariation, Membership
+
+
+def selected_fields(request, fields):
+    if request is None:
+        return list(fields)
+    requested = [field for field in request.query_params.get('fields', '').split(',') if field]
+    omitted = [field for field in request.query_params.get('omit', '').split(',') if field]
+    return [field for field in fields if (not requested or field in requested) and field not in omitted]
+
+
+class SparseFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None and request.method == 'GET':
+            keep = selected_fields(request, self.fields.keys())
+            for field in list(self.fields):
+                if field not in keep:
+                    self.fields.pop(field)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -13,20 +39,29 @@ class CategorySerializer(serializers.ModelSerializer):
     products_count = serializers.IntegerField(read_only=True)
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    variants = ImageVariantsField()
+
     def create(self, validated_data):
         product_id = self.context['product_id']
         return ProductImage.objects.create(product_id=product_id, **validated_data)
 
     class Meta:
         model = ProductImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'variants']
 
 class ProductVariationSerializer(serializers.ModelSerializer):
+    variants = ImageVariantsField()
+
     class Meta:
         model = ProductVariation
-        fields = ['sku', 'quantity', 'type', 'price', 'stock', 'image']
+        fields = ['id', 'sku', 'quantity', 'type', 'price', 'stock', 'image', 'variants']
 
-class ProductSerializer(serializers.ModelSerializer):
+class SimpleProductVariationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductVariation
+        fields = ['id', 'sku', 'quantity', 'type', 'price']
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
     variations = ProductVariationSerializer(many=True, read_only=True)
     category = CategorySerializer(many=True, read_only=True)
@@ -39,7 +74,60 @@ class ProductSerializer(serializers.ModelSerializer):
         method_name='calculate_tax')
 
     def calculate_tax(self, product: Product):
-        return product.price * Decimal(1.1)
+        unit_price, = PricingEngine().unit_prices([(product, None)])
+        return with_tax(unit_price)
+
+
+class ProductListingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='product_id')
+    category = serializers.JSONField(source='categories')
+    images = serializers.SerializerMethodField()
+    variations = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductListing
+        fields = ['id', 'name', 'shortDescription', 'fullDescription', 'slug', 'stock',
+                  'price', 'price_with_tax', 'variations', 'category', 'images','new','discount']
+
+    price_with_tax = serializers.SerializerMethodField(
+        method_name='calculate_tax')
+
+    def calculate_tax(self, listing: ProductListing):
+        # priced by PricingEngine when the listing was built
+        return with_tax(listing.effective_price)
+
+    def build_url(self, url):
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def build_variant_urls(self, variants):
+        return {
+            variant: {format: self.build_url(url) for format, url in formats.items()}
+            for variant, formats in variants.items()
+        }
+
+    def get_images(self, listing: ProductListing):
+        return [
+            {
+                **image,
+                'image': self.build_url(image['image']),
+                'variants': self.build_variant_urls(image.get('variants', {})),
+            }
+            for image in listing.images
+        ]
+
+    def get_variations(self, listing: ProductListing):
+        return [
+            {
+                **variation,
+                'price': Decimal(variation['price']) if variation['price'] is not None else None,
+                'image': self.build_url(variation['image']),
+                'variants': self.build_variant_urls(variation.get('variants', {})),
+            }
+            for variation in listing.variations
+        ]
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -60,15 +148,29 @@ class SimpleProductSerializer(serializers.ModelSerializer):
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = SimpleProductSerializer()
+    variation = SimpleProductVariationSerializer()
     total_price = serializers.SerializerMethodField()
+    final_price_after_discount = serializers.SerializerMethodField()
 
+    def get_line_price(self, cart_item: CartItem):
+        # CartSerializer prices the whole cart up front
+        line_prices = self.context.get('line_prices')
+        if line_prices is None or cart_item.id not in line_prices:
+            engine = PricingEngine(membership=self.context.get('membership'))
+            line_prices, _ = engine.price_cart_items([cart_item])
+        return line_prices[cart_item.id]
 
     def get_total_price(self, cart_item: CartItem):
-        return cart_item.quantity * cart_item.product.price
+        _, line_price = self.get_line_price(cart_item)
+        return line_price
+
+    def get_final_price_after_discount(self, cart_item: CartItem):
+        _, line_price = self.get_line_price(cart_item)
+        return line_price
 
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'quantity', 'total_price', 'final_price_after_discount']
+        fields = ['id', 'product', 'variation', 'quantity', 'total_price', 'final_price_after_discount']
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -76,8 +178,16 @@ class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
 
+    def to_representation(self, cart):
+        engine = PricingEngine(membership=self.context.get('membership'))
+        self.context['line_prices'], self.context['cart_total'] = engine.price_cart_items(cart.items.all())
+        return super().to_representation(cart)
+
     def get_total_price(self, cart):
-        return sum([item.quantity * item.product.price for item in cart.items.all()])
+        return self.context['cart_total']
+
+    def create(self, validated_data):
+        return get_cart_storage().create()
 
     class Meta:
         model = Cart
@@ -86,8 +196,10 @@ class CartSerializer(serializers.ModelSerializer):
 
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
+    # ignored: line prices are priced server side
     final_price_after_discount = serializers.DecimalField(required=False, allow_null=True, max_digits=6, decimal_places=2)
-    variation = serializers.CharField(required=False, allow_null=True, max_length=255)
+    variation = serializers.PrimaryKeyRelatedField(
+        queryset=ProductVariation.objects.all(), required=False, allow_null=True)
 
     def validate_product_id(self, value):
         if not Product.objects.filter(pk=value).exists():
@@ -95,25 +207,19 @@ class AddCartItemSerializer(serializers.ModelSerializer):
                 'No product with the given ID was found.')
         return value
 
-    def save(self, **kwargs):
-        cart_id = self.context['cart_id']
-        product_id = self.validated_data['product_id']
-        variation = self.validated_data['variation']
-        quantity = self.validated_data['quantity']
-        final_price_after_discount = self.validated_data['final_price_after_discount']
-
-        try:
-            cart_item = CartItem.objects.get(
-                cart_id=cart_id, product_id=product_id)
-            cart_item.variation = variation
-            cart_item.quantity += quantity
-            cart_item.final_price_after_discount = final_price_after_discount
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(
-                cart_id=cart_id, **self.validated_data)
+    def validate(self, attrs):
+        variation = attrs.get('variation')
+        if variation is not None and variation.product_id != attrs['product_id']:
+            raise serializers.ValidationError(
+                {'variation': 'This variation does not belong to the given product.'})
+        return attrs
 
+    def save(self, **kwargs):
+        self.instance = get_cart_storage().add_item(
+            self.context['cart_id'],
+            self.validated_data['product_id'],
+            self.validated_data.get('variation'),
+            self.validated_data['quantity'])
         return self.instance
 
     class Meta:
@@ -121,7 +227,54 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product_id', 'variation', 'quantity', 'final_price_after_discount']
 
 
+class CartItemOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['add', 'update', 'remove'])
+    product_id = serializers.IntegerField()
+    variation = serializers.IntegerField(required=False, allow_null=True)
+    quantity = serializers.IntegerField(min_value=1, max_value=MAX_QUANTITY, required=False)
+
+    def validate(self, attrs):
+        if attrs['action'] != 'remove' and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        return attrs
+
+
+class CartItemBatchSerializer(serializers.Serializer):
+    operations = CartItemOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, operations):
+        product_ids = [operation['product_id'] for operation in operations]
+        if len(set(product_ids)) != len(product_ids):
+            raise serializers.ValidationError('Each product can only appear once.')
+
+        found = set(Product.objects.filter(pk__in=product_ids).values_list('id', flat=True))
+        variations = ProductVariation.objects.in_bulk(
+            [operation['variation'] for operation in operations if operation.get('variation')])
+        errors = []
+        for operation in operations:
+            error = {}
+            if operation['product_id'] not in found:
+                error['product_id'] = 'No product with the given ID was found.'
+            if operation.get('variation'):
+                variation = variations.get(operation['variation'])
+                if variation is None or variation.product_id != operation['product_id']:
+                    error['variation'] = 'This variation does not belong to the given product.'
+                operation['variation'] = variation
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return operations
+
+    def save(self, **kwargs):
+        storage = get_cart_storage()
+        storage.apply(self.context['cart_id'], self.validated_data['operations'])
+        return storage.get(self.context['cart_id'])
+
+
 class UpdateCartItemSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        return get_cart_storage().update_item(instance, validated_data['quantity'])
+
     class Meta:
         model = CartItem
         fields = ['quantity']
@@ -149,13 +302,14 @@ class BillingAddressSerializer(serializers.ModelSerializer):
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product = SimpleProductSerializer()
+    variation = SimpleProductVariationSerializer()
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'variation', 'unit_price', 'final_price_after_discount', 'quantity']
+        fields = ['id', 'product', 'variation', 'variation_label', 'unit_price', 'final_price_after_discount', 'quantity']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
 
     class Meta:
@@ -171,68 +325,82 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
 
 class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
-    billing_address_id = serializers.IntegerField()
-    optional_shipping_address_id = serializers.IntegerField(required=False, allow_null=True)
-    final_price = serializers.DecimalField(max_digits=6, decimal_places=2)
-
+    billing_address_id = serializers.PrimaryKeyRelatedField(queryset=BillingAddress.objects.all())
+    optional_shipping_address_id = serializers.PrimaryKeyRelatedField(
+        queryset=OptionalShippingAddress.objects.all(), required=False, allow_null=True)
+    # ignored: the total is priced server side
+    final_price = serializers.DecimalField(max_digits=6, decimal_places=2, required=False)
+    coupon_code = serializers.CharField(required=False, allow_blank=True, max_length=255)
+
+    def validate_coupon_code(self, coupon_code):
+        if not coupon_code:
+            return None
+        coupon = get_coupon(coupon_code)
+        if coupon is None:
+            raise serializers.ValidationError('This coupon is invalid or has expired.')
+        return coupon
 
     def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
-            raise serializers.ValidationError(
-                'No cart with the given ID was found.')
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
+        storage = get_cart_storage()
+        self.cart_items = storage.get_items(cart_id)
+        if not self.cart_items:
+            if not storage.exists(cart_id):
+                raise serializers.ValidationError(
+                    'No cart with the given ID was found.')
             raise serializers.ValidationError('The cart is empty.')
         return cart_id
 
     def save(self, **kwargs):
-        with transaction.atomic():
-            cart_id = self.validated_data['cart_id']
-            
-            customer_id = self.context.get('user_id')
-            if customer_id:
-                customer = Customer.objects.get(user_id=customer_id)
-            else:
-                customer = None
-            
-            billing_address_id = self.validated_data['billing_address_id']
-            billing_address = BillingAddress.objects.get(pk=billing_address_id)
-
-            optional_shipping_address_id = self.validated_data.get('optional_shipping_address_id')
-            optional_shipping_address = None
-            if optional_shipping_address_id is not None:
-                optional_shipping_address = OptionalShippingAddress.objects.get(pk=optional_shipping_address_id)
-            cart_items = CartItem.objects \
-                .select_related('product') \
-                .filter(cart_id=cart_id)
-
-            final_price = self.validated_data['final_price']
+        """
+        Everything is read and priced before the transaction starts, which
+        then only writes: the order, its items, the cart and, last, the
+        stock reservation, so its snapshot row locks are held as briefly as
+        possible.
+        """
+        cart_id = self.validated_data['cart_id']
+        cart_items = self.cart_items
+        customer = None
+        if self.context.get('user_id'):
+            customer = Customer.objects.select_related('membership').get(user_id=self.context['user_id'])
+
+        engine = PricingEngine(
+            membership=customer.membership if customer else None,
+            coupon=self.validated_data.get('coupon_code'))
+        line_prices, final_price = engine.price_cart_items(cart_items)
 
+        with transaction.atomic():
             order = Order.objects.create(
                 customer=customer,
-                billing_address=billing_address,
-                optional_shipping_address=optional_shipping_address,
-                final_price = final_price
+                billing_address=self.validated_data['billing_address_id'],
+                optional_shipping_address=self.validated_data.get('optional_shipping_address_id'),
+                final_price=final_price
             )
 
-            cart_items = CartItem.objects \
-                .select_related('product') \
-                .filter(cart_id=cart_id)
-            order_items = [
-                OrderItem(
+            order_items = []
+            for item in cart_items:
+                _, line_price = line_prices[item.id]
+                variation = item.variation
+                order_items.append(OrderItem(
                     order=order,
                     product=item.product,
-                    variation=item.variation,
-                    unit_price=item.product.price,
-                    final_price_after_discount=item.final_price_after_discount,
+                    variation=variation,
+                    variation_label=variation.type if variation else '',
+                    unit_price=variation.price if variation and variation.price else item.product.price,
+                    final_price_after_discount=line_price,
                     quantity=item.quantity
-                ) for item in cart_items
-            ]
+                ))
             OrderItem.objects.bulk_create(order_items)
-            Cart.objects.filter(pk=cart_id).delete()
-            order.save()
-            order_created.send_robust(self.__class__, order=order)
-
-            return order
+            get_cart_storage().discard(cart_id)
+            reserve_stock([(item.product, item.variation, item.quantity) for item in cart_items], order)
+            # the emails are queued in the order's transaction, so a committed
+            # order always has them in the outbox
+            prefetch_related_objects([order], Prefetch('items', queryset=OrderItem.objects.select_related('product', 'variation')))
+            send_order_confirmation_email(order)
+            send_order_alert_to_admin(order)
+            transaction.on_commit(lambda: deliver_outbox.delay())
+
+        order_created.send_robust(self.__class__, order=order)
+        return order
 
 
 
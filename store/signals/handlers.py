@@ -1,10 +1,18 @@
 from django.conf import settings
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
 from django.dispatch import receiver
 from django.db import transaction
-from store.models import BillingAddress, Customer, OptionalShippingAddress, Order
-from store.emails import send_order_alert_to_admin, send_order_confirmation_email
+from django.utils import timezone
+from store.models import BillingAddress, Category, Customer, OptionalShippingAddress, Product, ProductImage, ProductVariation
+from store.caching import invalidate
+from store.search import get_search_backend
+from store.listing import refresh_listings_on_commit
+from store.inventory import set_stock, stock_item
+from django.contrib.contenttypes.models import ContentType
+from ailments.models import AilmentItem
+from tags.models import TaggedItem
 from core.emails import send_user_registration_mail
+from core.tasks import deliver_outbox, queue_image_variants
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, **kwargs):
@@ -17,7 +25,8 @@ def send_user_creation_email_on_membership_update(sender, instance, **kwargs):
     customer = instance
     if customer.membership:
         if post_save:
-            transaction.on_commit(lambda:send_user_registration_mail(instance.user))
+            send_user_registration_mail(instance.user)
+            transaction.on_commit(lambda: deliver_outbox.delay())
 
 
 @receiver(post_save, sender=BillingAddress)
@@ -54,9 +63,169 @@ def delete_customer_optional_shipping_address(sender, instance, **kwargs):
         customer.save()
 
 
-# send order confirmation email
-@receiver(post_save, sender=Order)
-def send_order_confirmation(sender, instance, created, **kwargs):
-    if created:
-        transaction.on_commit(lambda: send_order_confirmation_email(instance))
-        transaction.on_commit(lambda: send_order_alert_to_admin(instance))
\ No newline at end of file
+# invalidate cached catalog responses
+@receiver(post_save, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate('products', f'product:{instance.pk}')
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product_cache(sender, instance, **kwargs):
+    invalidate('products', f'product:{instance.pk}', 'categories')
+
+
+@receiver([post_save, post_delete], sender=ProductVariation)
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_children_cache(sender, instance, **kwargs):
+    invalidate('products', f'product:{instance.product_id}')
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+def invalidate_product_category_cache(sender, action, **kwargs):
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        invalidate('products', 'categories')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    # nested category titles are part of every product payload
+    invalidate('products', 'categories')
+
+
+@receiver([post_save, post_delete], sender=TaggedItem)
+@receiver([post_save, post_delete], sender=AilmentItem)
+def invalidate_generic_item_cache(sender, instance, **kwargs):
+    # tags and ailments feed the product list facets
+    if instance.content_type_id == ContentType.objects.get_for_model(Product).id:
+        invalidate('products')
+
+
+
+# keep the product search index in sync
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, **kwargs):
+    get_search_backend().update(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+
+# touch parents whose payload embeds the changed rows, so their
+# Last-Modified / ETag validators move
+@receiver([post_save, post_delete], sender=ProductVariation)
+@receiver([post_save, post_delete], sender=ProductImage)
+def touch_product(sender, instance, **kwargs):
+    Product.objects.filter(pk=instance.product_id).update(last_update=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=TaggedItem)
+@receiver([post_save, post_delete], sender=AilmentItem)
+def touch_generic_item_product(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Product).id:
+        Product.objects.filter(pk=instance.object_id).update(last_update=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+def touch_category_products(sender, instance, **kwargs):
+    Product.objects.filter(category=instance).update(last_update=timezone.now())
+
+
+@receiver(pre_delete, sender=Product)
+def touch_deleted_product_categories(sender, instance, **kwargs):
+    # the cascade drops the category links without firing m2m_changed
+    Category.objects.filter(products=instance).update(last_update=timezone.now())
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+def touch_product_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+    now = timezone.now()
+    if reverse:
+        Category.objects.filter(pk=instance.pk).update(last_update=now)
+        products = Product.objects.filter(category=instance) if pk_set is None else Product.objects.filter(pk__in=pk_set)
+        products.update(last_update=now)
+    else:
+        Product.objects.filter(pk=instance.pk).update(last_update=now)
+        categories = Category.objects.filter(products=instance) if pk_set is None else Category.objects.filter(pk__in=pk_set)
+        categories.update(last_update=now)
+
+
+
+# keep the product listing projection up to date
+@receiver(post_save, sender=Product)
+def refresh_product_listing(sender, instance, **kwargs):
+    refresh_listings_on_commit([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=ProductVariation)
+@receiver([post_save, post_delete], sender=ProductImage)
+def refresh_product_children_listing(sender, instance, **kwargs):
+    refresh_listings_on_commit([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_listings(sender, instance, **kwargs):
+    refresh_listings_on_commit(instance.products.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def refresh_deleted_category_listings(sender, instance, **kwargs):
+    # the cascade drops the category links without firing m2m_changed
+    product_ids = list(instance.products.values_list('pk', flat=True))
+    Product.objects.filter(pk__in=product_ids).update(last_update=timezone.now())
+    refresh_listings_on_commit(product_ids)
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+def refresh_product_category_listings(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+    if not reverse:
+        refresh_listings_on_commit([instance.pk])
+    elif pk_set is not None:
+        refresh_listings_on_commit(pk_set)
+    else:
+        refresh_listings_on_commit(instance.products.values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=TaggedItem)
+@receiver([post_save, post_delete], sender=AilmentItem)
+def refresh_generic_item_listing(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Product).id:
+        refresh_listings_on_commit([instance.object_id])
+
+
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_save, sender=ProductImage)
+def generate_product_image_variants(sender, instance, **kwargs):
+    queue_image_variants(instance)
+
+
+# Stock edits through the admin or the API become ledger adjustments;
+# compaction writes stock back with update(), which skips these. Saves
+# limited to other fields (e.g. the image variants task) may hold a stock
+# value read before the last compaction, so they're left alone.
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductVariation)
+def remember_stock(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'stock' not in update_fields:
+        return
+    instance._saved_stock = sender.objects.filter(pk=instance.pk).values_list('stock', flat=True).first() \
+        if instance.pk else None
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductVariation)
+def record_stock_adjustment(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'stock' not in update_fields:
+        return
+    if instance.stock is None or (not created and instance.stock == getattr(instance, '_saved_stock', None)):
+        return
+    if sender is Product:
+        set_stock({(instance.pk, None): instance.stock})
+    else:
+        set_stock({stock_item(instance.product, instance): instance.stock})
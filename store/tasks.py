@@ -0,0 +1,36 @@
+import time
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from .carts import purge_carts
+from .inventory import compact_stock
+from .listing import expire_offers
+from .recommendations import build_recommendations
+
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def compact_inventory():
+    return compact_stock()
+
+
+@shared_task
+def expire_product_offers():
+    return expire_offers()
+
+
+@shared_task
+def rebuild_recommendations():
+    return build_recommendations()
+
+
+@shared_task
+def purge_abandoned_carts(batch_size=1000):
+    started = time.monotonic()
+    carts, items = purge_carts(batch_size=batch_size)
+    seconds = time.monotonic() - started
+    rate = (carts + items) / seconds if seconds else 0
+    logger.info('Purged %d carts and %d cart items in %.2fs (%.0f rows/s)', carts, items, seconds, rate)
+    return {'carts': carts, 'items': items, 'seconds': seconds, 'rows_per_second': rate}
+
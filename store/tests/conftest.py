@@ -1,10 +1,23 @@
 from core.models import User
 from rest_framework.test import APIClient
 import pytest
+from django.core.cache import cache
+from django.urls import get_resolver
+from model_bakery import baker
+from store.models import Category, Product, ProductImage, ProductVariation
+from treatnaturallystore.celery import celery
 
 
 
 
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    # The admin creates the Graphics and BusinessDetails singletons when the
+    # URLconf is first loaded; do it up front so query counts don't see it.
+    with django_db_blocker.unblock():
+        get_resolver().url_patterns
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -13,4 +26,31 @@ def api_client():
 def authenticate(api_client):
     def do_authenticate(is_staff=False):
         return api_client.force_authenticate(user=User(is_staff=is_staff))
-    return do_authenticate
\ No newline at end of file
+    return do_authenticate
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def celery_eager():
+    # there's no broker in tests, so tasks queued by signals run in-process
+    previous = celery.conf.task_always_eager, celery.conf.task_eager_propagates
+    celery.conf.task_always_eager = celery.conf.task_eager_propagates = True
+    yield
+    celery.conf.task_always_eager, celery.conf.task_eager_propagates = previous
+
+
+@pytest.fixture
+def create_products(django_capture_on_commit_callbacks):
+    def do_create_products(count):
+        with django_capture_on_commit_callbacks(execute=True):
+            category = baker.make(Category)
+            products = baker.make(Product, price=10, stock=5, _quantity=count)
+            for product in products:
+                product.category.add(category)
+                baker.make(ProductVariation, product=product, _quantity=2)
+                baker.make(ProductImage, product=product, _quantity=2)
+        return products
+    return do_create_products
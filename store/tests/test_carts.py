@@ -0,0 +1,269 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import redis
+from django.db import connection
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import APIClient
+import pytest
+from core.models import User
+from store import carts
+from store.models import BillingAddress, Cart, CartItem, Order, Product, ProductVariation
+from store.tasks import purge_abandoned_carts
+
+
+REDIS_URL = os.environ.get('TEST_CART_REDIS_URL', 'redis://localhost:6379/15')
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(REDIS_URL).ping()
+    except redis.ConnectionError:
+        return False
+
+
+@pytest.fixture
+def redis_carts(settings, monkeypatch):
+    storage = carts.RedisCartStorage(REDIS_URL)
+    monkeypatch.setitem(carts._storages, 'redis', storage)
+    settings.CART_STORAGE = 'redis'
+    yield storage
+    storage.connection.flushdb()
+
+
+@pytest.mark.django_db
+class TestAddCartItem:
+    def test_if_variation_is_valid_returns_201(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+        variation = baker.make(ProductVariation, product=product, price=20)
+
+        response = api_client.post(f'/store/carts/{cart.id}/items/', {
+            'product_id': product.id, 'variation': variation.id, 'quantity': 2})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert CartItem.objects.get(cart=cart).variation == variation
+
+    def test_variation_id_from_the_catalog_can_be_added(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+        variation = baker.make(ProductVariation, product=product, price=20)
+
+        listed = api_client.get('/store/products/').data['results'][0]['variations'][0]
+        detail = api_client.get(f'/store/products/{product.id}/').data['variations'][0]
+        response = api_client.post(f'/store/carts/{cart.id}/items/', {
+            'product_id': product.id, 'variation': listed['id'], 'quantity': 1})
+
+        assert listed['id'] == detail['id'] == variation.id
+        assert response.status_code == status.HTTP_201_CREATED
+        assert CartItem.objects.get(cart=cart).variation == variation
+
+    def test_if_product_is_in_cart_adds_to_its_quantity(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+        item = baker.make(CartItem, cart=cart, product=product, quantity=2)
+
+        response = api_client.post(f'/store/carts/{cart.id}/items/', {'product_id': product.id, 'quantity': 3})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['id'] == item.id
+        assert response.data['quantity'] == 5
+        assert CartItem.objects.get(cart=cart).quantity == 5
+
+    def test_if_line_is_full_caps_its_quantity(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+        baker.make(CartItem, cart=cart, product=product, quantity=carts.MAX_QUANTITY)
+
+        response = api_client.post(f'/store/carts/{cart.id}/items/', {'product_id': product.id, 'quantity': 5})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert CartItem.objects.get(cart=cart).quantity == carts.MAX_QUANTITY
+
+    def test_if_variation_belongs_to_another_product_returns_400(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+        variation = baker.make(ProductVariation, product=baker.make(Product, price=10, stock=5))
+
+        response = api_client.post(f'/store/carts/{cart.id}/items/', {
+            'product_id': product.id, 'variation': variation.id, 'quantity': 2})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'variation' in response.data
+
+
+@pytest.mark.django_db
+class TestRetrieveCart:
+    def test_items_include_their_variation(self, api_client, django_assert_max_num_queries):
+        cart = baker.make(Cart)
+        for _ in range(3):
+            product = baker.make(Product, price=10, stock=5)
+            variation = baker.make(ProductVariation, product=product, price=20, discount=None)
+            baker.make(CartItem, cart=cart, product=product, variation=variation, quantity=1)
+
+        with django_assert_max_num_queries(4):
+            response = api_client.get(f'/store/carts/{cart.id}/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert {item['variation']['id'] for item in response.data['items']} == \
+            set(ProductVariation.objects.values_list('id', flat=True))
+        assert response.data['items'][0]['final_price_after_discount'] == 20
+
+
+@pytest.mark.django_db
+class TestBatchCartItems:
+    def test_applies_all_operations_and_returns_the_cart(self, api_client, django_assert_max_num_queries):
+        cart = baker.make(Cart)
+        kept, updated, removed = baker.make(Product, price=10, stock=5, _quantity=3)
+        added = baker.make(Product, price=10, stock=5, _quantity=5)
+        variation = baker.make(ProductVariation, product=added[0], price=20, discount=None)
+        baker.make(CartItem, cart=cart, product=kept, quantity=1)
+        baker.make(CartItem, cart=cart, product=updated, quantity=1)
+        baker.make(CartItem, cart=cart, product=removed, quantity=1)
+        operations = [
+            {'action': 'update', 'product_id': updated.id, 'quantity': 4},
+            {'action': 'remove', 'product_id': removed.id},
+            {'action': 'add', 'product_id': added[0].id, 'variation': variation.id, 'quantity': 2},
+            *[{'action': 'add', 'product_id': product.id, 'quantity': 1} for product in added[1:]],
+        ]
+
+        with django_assert_max_num_queries(10):
+            response = api_client.post(f'/store/carts/{cart.id}/items/batch/', {'operations': operations}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        quantities = {item['product']['id']: item['quantity'] for item in response.data['items']}
+        assert quantities == {kept.id: 1, updated.id: 4, **{product.id: 2 if product == added[0] else 1 for product in added}}
+        assert response.data['total_price'] == 10 + 40 + 40 + 40
+        assert CartItem.objects.get(cart=cart, product=added[0]).variation == variation
+
+    def test_adding_to_a_line_caps_its_quantity(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+        baker.make(CartItem, cart=cart, product=product, quantity=carts.MAX_QUANTITY - 1)
+
+        response = api_client.post(f'/store/carts/{cart.id}/items/batch/', {'operations': [
+            {'action': 'add', 'product_id': product.id, 'quantity': carts.MAX_QUANTITY},
+        ]}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['items'][0]['quantity'] == carts.MAX_QUANTITY
+
+    def test_if_any_operation_is_invalid_applies_none(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+
+        response = api_client.post(f'/store/carts/{cart.id}/items/batch/', {'operations': [
+            {'action': 'add', 'product_id': product.id, 'quantity': 1},
+            {'action': 'add', 'product_id': 0, 'quantity': 1},
+        ]}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['operations'][1]['product_id']
+        assert not CartItem.objects.exists()
+
+
+@pytest.mark.django_db
+class TestPurgeCarts:
+    def test_deletes_expired_carts_in_batches(self, settings):
+        settings.CART_EXPIRY = 60 * 60
+        expired = baker.make(Cart, _quantity=5)
+        current = baker.make(Cart)
+        for cart in [*expired, current]:
+            baker.make(CartItem, cart=cart, product=baker.make(Product, price=10, stock=5), quantity=1)
+        Cart.objects.filter(pk__in=[cart.pk for cart in expired]).update(created_at=timezone.now() - timedelta(hours=2))
+
+        result = purge_abandoned_carts(batch_size=2)
+
+        assert result['carts'] == 5
+        assert result['items'] == 5
+        assert list(Cart.objects.all()) == [current]
+        assert CartItem.objects.get().cart == current
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(not redis_available(), reason='needs a Redis server')
+class TestRedisCarts:
+    def test_cart_lives_in_redis_until_the_order_is_placed(self, api_client, redis_carts, django_capture_on_commit_callbacks):
+        product = baker.make(Product, price=10, stock=5)
+        variation = baker.make(ProductVariation, product=product, price=20, discount=None)
+
+        cart_id = api_client.post('/store/carts/').data['id']
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'variation': variation.id, 'quantity': 1})
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'variation': variation.id, 'quantity': 2})
+        response = api_client.get(f'/store/carts/{cart_id}/')
+
+        assert not Cart.objects.exists()
+        assert response.data['items'][0]['quantity'] == 3
+        assert response.data['total_price'] == 60
+
+        api_client.force_authenticate(user=baker.make(User))
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post('/store/orders/', {
+                'cart_id': cart_id,
+                'billing_address_id': baker.make(BillingAddress).id,
+            })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert Order.objects.get().items.get().variation == variation
+        assert not Cart.objects.exists()
+        assert redis_carts.get(cart_id) is None
+
+    def test_adding_to_a_line_caps_its_quantity(self, api_client, redis_carts):
+        product, other = baker.make(Product, price=10, stock=5, _quantity=2)
+        cart_id = api_client.post('/store/carts/').data['id']
+        api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': carts.MAX_QUANTITY})
+
+        single = api_client.post(f'/store/carts/{cart_id}/items/', {'product_id': product.id, 'quantity': 5})
+        api_client.post(f'/store/carts/{cart_id}/items/batch/', {'operations': [
+            {'action': 'add', 'product_id': other.id, 'quantity': carts.MAX_QUANTITY},
+            {'action': 'add', 'product_id': product.id, 'quantity': 5},
+        ]}, format='json')
+        response = api_client.get(f'/store/carts/{cart_id}/')
+
+        assert single.data['quantity'] == carts.MAX_QUANTITY
+        assert [item['quantity'] for item in response.data['items']] == [carts.MAX_QUANTITY] * 2
+
+    def test_if_cart_does_not_exist_returns_404(self, api_client, redis_carts):
+        product = baker.make(Product, price=10, stock=5)
+
+        response = api_client.post('/store/carts/00000000-0000-0000-0000-000000000000/items/', {'product_id': product.id, 'quantity': 1})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.skipif(connection.vendor != 'mysql', reason='MySQL has no RETURNING, so the upsert reads the id back')
+@pytest.mark.django_db
+class TestAddCartItemOnMySQL:
+    def test_adding_to_a_line_returns_its_id_and_total_quantity(self):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+        storage = carts.SQLCartStorage()
+
+        first = storage.add_item(cart.id, product.id, None, 2)
+        second = storage.add_item(cart.id, product.id, None, 3)
+
+        assert second.id == first.id == CartItem.objects.get(cart=cart).id
+        assert (first.quantity, second.quantity) == (2, 5)
+        assert CartItem.objects.get(cart=cart).quantity == 5
+
+
+@pytest.mark.skipif(connection.vendor == 'sqlite', reason='SQLite locks the whole database for writes')
+@pytest.mark.django_db(transaction=True)
+class TestAddCartItemConcurrently:
+    def test_concurrent_adds_of_a_product_add_up(self):
+        cart = baker.make(Cart)
+        product = baker.make(Product, price=10, stock=5)
+
+        def add(_):
+            try:
+                return APIClient().post(f'/store/carts/{cart.id}/items/', {'product_id': product.id, 'quantity': 1}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(add, range(8)))
+
+        assert results == [status.HTTP_201_CREATED] * 8
+        assert CartItem.objects.get(cart=cart).quantity == 8
@@ -0,0 +1,69 @@
+from decimal import Decimal
+from django.core.management import call_command
+from model_bakery import baker
+import pytest
+from store.models import Category, Product, ProductListing, ProductVariation
+
+
+CSV = '''sku,name,price,stock,categories,variation_sku,variation_type,variation_price
+A1,Lavender Oil,12.50,5,Oils|Relaxation,A1-10,10ml,12.50
+A1,Lavender Oil,12.50,5,Oils|Relaxation,A1-30,30ml,29.00
+B2,Chamomile Tea,4.00,20,Teas,,,
+,Missing Sku,1.00,1,,,,
+'''
+
+
+@pytest.mark.django_db(transaction=True)
+class TestImportCatalog:
+    def test_creates_products_variations_and_categories(self, tmp_path):
+        path = tmp_path / 'catalog.csv'
+        path.write_text(CSV)
+
+        call_command('import_catalog', str(path), batch_size=2)
+
+        lavender = Product.objects.get(sku='A1')
+        assert lavender.price == Decimal('12.50')
+        assert sorted(lavender.variations.values_list('sku', flat=True)) == ['A1-10', 'A1-30']
+        assert sorted(lavender.category.values_list('title', flat=True)) == ['Oils', 'Relaxation']
+        assert Product.objects.count() == 2
+        assert ProductListing.objects.get(product=lavender).variations[1]['type'] == '30ml'
+
+    def test_updates_existing_rows_in_place(self, tmp_path):
+        path = tmp_path / 'catalog.csv'
+        path.write_text(CSV)
+        call_command('import_catalog', str(path))
+        unlinked = Category.objects.get(title='Relaxation')
+        path.write_text('sku,price,categories,variation_sku,variation_stock\nA1,15.00,Oils,A1-10,3\n')
+
+        call_command('import_catalog', str(path))
+
+        lavender = Product.objects.get(sku='A1')
+        assert lavender.price == Decimal('15.00')
+        assert lavender.name == 'Lavender Oil'
+        assert list(lavender.category.values_list('title', flat=True)) == ['Oils']
+        assert ProductVariation.objects.get(sku='A1-10').stock == 3
+        assert Category.objects.filter(title='Oils').count() == 1
+        assert Category.objects.get(pk=unlinked.pk).last_update > unlinked.last_update
+
+    def test_skips_skus_shared_by_several_products(self, tmp_path, capsys):
+        first, second = baker.make(Product, sku='1', price=10, stock=5, _quantity=2)
+        path = tmp_path / 'catalog.csv'
+        path.write_text('sku,price\n1,15.00\n')
+
+        call_command('import_catalog', str(path))
+
+        assert set(Product.objects.values_list('price', flat=True)) == {Decimal('10.00')}
+        assert 'shared by several products: 1' in capsys.readouterr().err
+
+    def test_export_round_trips(self, tmp_path):
+        source = tmp_path / 'catalog.csv'
+        source.write_text(CSV)
+        call_command('import_catalog', str(source))
+        exported = tmp_path / 'export.jsonl'
+
+        call_command('export_catalog', str(exported))
+        Product.objects.all().delete()
+        call_command('import_catalog', str(exported))
+
+        assert Product.objects.count() == 2
+        assert ProductVariation.objects.count() == 2
@@ -0,0 +1,33 @@
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from model_bakery import baker
+from PIL import Image
+import pytest
+from store.models import Product, ProductImage
+
+
+def make_upload():
+    buffer = BytesIO()
+    Image.new('RGBA', (2000, 1000), (40, 120, 60, 255)).save(buffer, 'PNG')
+    return SimpleUploadedFile('oil.png', buffer.getvalue(), content_type='image/png')
+
+
+@pytest.mark.django_db
+class TestImageVariants:
+    def test_upload_generates_variants(self, api_client, settings, tmp_path, django_capture_on_commit_callbacks):
+        settings.MEDIA_ROOT = tmp_path
+        product = baker.make(Product, price=10, stock=5)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            image = ProductImage.objects.create(product=product, image=make_upload())
+
+        image.refresh_from_db()
+        assert image.variants['source'] == image.image.name
+        with Image.open(tmp_path / image.variants['thumb']['webp']) as thumb:
+            assert thumb.size == (150, 150)
+        with Image.open(tmp_path / image.variants['card']['jpeg']) as card:
+            assert card.size == (480, 240)
+
+        response = api_client.get(f'/store/products/{product.id}/images/')
+
+        assert response.data[0]['variants']['full']['webp'].endswith('/store/images/oil_full.webp')
@@ -0,0 +1,266 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import cache
+from django.db import connection
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import APIClient
+import pytest
+from core import idempotency
+from core.models import OutboundEmail, User
+from store.inventory import InsufficientStock, compact_stock, stock_levels
+from store.models import BillingAddress, Cart, CartItem, Order, Product, ProductVariation, StockMovement
+from store.serializers import CreateOrderSerializer
+from store.signals import order_created
+
+
+@pytest.fixture
+def place_order():
+    def do_place_order(user, items):
+        cart = baker.make(Cart)
+        for product, variation, quantity in items:
+            baker.make(CartItem, cart=cart, product=product, variation=variation, quantity=quantity)
+        serializer = CreateOrderSerializer(
+            data={'cart_id': cart.id, 'billing_address_id': baker.make(BillingAddress).id},
+            context={'user_id': user.id})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+    return do_place_order
+
+
+@pytest.mark.django_db
+class TestReserveStock:
+    def test_order_decrements_product_and_variation_stock(self, place_order):
+        user = baker.make(User)
+        product = baker.make(Product, price=10, stock=5)
+        variation = baker.make(ProductVariation, product=product, sku='L-30', price=20, stock=3)
+
+        place_order(user, [(product, None, 2)])
+        order = place_order(user, [(product, variation, 1)])
+        compact_stock()
+
+        product.refresh_from_db()
+        variation.refresh_from_db()
+        assert product.stock == 3
+        assert variation.stock == 2
+        variation.delete()
+        assert order.items.get().variation_label == variation.type
+
+    def test_catalog_shows_the_new_stock_once_the_order_commits(self, api_client, place_order, django_capture_on_commit_callbacks):
+        product, other = baker.make(Product, price=10, stock=5, _quantity=2)
+        place_order(baker.make(User), [(other, None, 1)])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            place_order(baker.make(User), [(product, None, 2)])
+
+        assert api_client.get(f'/store/products/{product.id}/').data['stock'] == 3
+        assert {row['id']: row['stock'] for row in api_client.get('/store/products/').data['results']} == {product.id: 3, other.id: 5}
+        assert stock_levels([(other.id, None)]) == {(other.id, None): 4}
+
+    def test_if_lines_are_short_reports_all_and_reserves_nothing(self, api_client):
+        user = baker.make(User)
+        api_client.force_authenticate(user=user)
+        in_stock = baker.make(Product, price=10, stock=5)
+        short = baker.make(Product, price=10, stock=1)
+        variation = baker.make(ProductVariation, product=in_stock, sku='L-30', price=20, stock=0)
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product=in_stock, quantity=2)
+        baker.make(CartItem, cart=cart, product=short, quantity=2)
+        baker.make(CartItem, cart=cart, product=baker.make(Product, price=5, stock=9), quantity=1)
+
+        response = api_client.post('/store/orders/', {
+            'cart_id': cart.id,
+            'billing_address_id': baker.make(BillingAddress).id,
+        })
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data['items'] == [{'product_id': short.id, 'variation_id': None, 'requested': 2, 'available': 1}]
+        assert stock_levels([(in_stock.id, None)]) == {(in_stock.id, None): 5}
+        assert not Order.objects.exists()
+
+
+@pytest.mark.django_db
+class TestInventoryLedger:
+    def test_stock_is_snapshot_plus_recent_movements(self, place_order):
+        product = baker.make(Product, price=10, stock=5)
+        order = place_order(baker.make(User), [(product, None, 2)])
+
+        assert stock_levels([(product.id, None)]) == {(product.id, None): 3}
+        assert StockMovement.objects.filter(order=order).get().delta == -2
+        product.refresh_from_db()
+        assert product.stock == 5
+
+        assert compact_stock() == 1
+        product.refresh_from_db()
+        assert product.stock == 3
+        assert compact_stock() == 0
+
+    def test_saving_a_new_stock_level_records_an_adjustment(self, place_order):
+        product = baker.make(Product, price=10, stock=5)
+        place_order(baker.make(User), [(product, None, 2)])
+
+        product.stock = 10
+        product.save()
+        product.name = 'Renamed'
+        product.save()
+
+        adjustments = StockMovement.objects.filter(product=product, reason=StockMovement.REASON_ADJUSTMENT)
+        assert list(adjustments.values_list('delta', flat=True)) == [5, 7]
+        assert stock_levels([(product.id, None)]) == {(product.id, None): 10}
+
+    def test_deleting_a_product_keeps_its_movements(self):
+        product = baker.make(Product, price=10, stock=5)
+        key = str(product.id)
+
+        product.delete()
+
+        assert list(StockMovement.objects.values_list('key', 'product_id', 'delta')) == [(key, None, 5)]
+
+    def test_saving_other_fields_leaves_stock_alone(self, place_order):
+        product = baker.make(Product, price=10, stock=5)
+        variation = baker.make(ProductVariation, product=product, price=10, stock=5)
+        loaded = ProductVariation.objects.get(pk=variation.pk)
+        place_order(baker.make(User), [(product, variation, 2)])
+        compact_stock()
+
+        loaded.variants = {'source': 'oil.png'}
+        loaded.save(update_fields=['variants'])
+
+        assert stock_levels([(product.id, variation.id)]) == {(product.id, variation.id): 3}
+        assert not StockMovement.objects.filter(variation=variation, reason=StockMovement.REASON_ADJUSTMENT).exclude(delta=5).exists()
+
+
+@pytest.mark.skipif(connection.vendor == 'sqlite', reason='SQLite locks the whole database for writes')
+@pytest.mark.django_db(transaction=True)
+class TestReserveStockConcurrently:
+    def test_concurrent_orders_never_oversell(self, place_order):
+        users = baker.make(User, _quantity=12)
+        product = baker.make(Product, price=10, stock=5)
+
+        def attempt(user):
+            try:
+                place_order(user, [(product, None, 1)])
+                return True
+            except InsufficientStock:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            results = list(executor.map(attempt, users))
+
+        product.refresh_from_db()
+        assert results.count(True) == 5
+        assert product.stock == 0
+        assert Order.objects.count() == 5
+
+
+@pytest.mark.django_db
+class TestPlaceOrderQueries:
+    @pytest.mark.parametrize('lines', [1, 5])
+    def test_query_count_does_not_grow_with_the_cart(self, api_client, lines, django_assert_num_queries):
+        user = baker.make(User)
+        api_client.force_authenticate(user=user)
+        cart = baker.make(Cart)
+        for product in baker.make(Product, price=10, stock=5, _quantity=lines):
+            variation = baker.make(ProductVariation, product=product, price=20, stock=5)
+            baker.make(CartItem, cart=cart, product=product, variation=variation, quantity=1)
+        billing_address = baker.make(BillingAddress)
+
+        # cart items, billing address, customer; the order, its items, the
+        # cart (3), the stock reservation (3); the items, which the emails
+        # and the response share, and the two outbox rows, plus the test's
+        # savepoint pair
+        with django_assert_num_queries(16):
+            response = api_client.post('/store/orders/', {'cart_id': cart.id, 'billing_address_id': billing_address.id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['items']) == lines
+
+
+@pytest.fixture
+def order_payload():
+    def do_order_payload():
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product=baker.make(Product, price=10, stock=5), quantity=1)
+        return {'cart_id': str(cart.id), 'billing_address_id': baker.make(BillingAddress).id}
+    return do_order_payload
+
+
+@pytest.mark.django_db
+class TestOrderEmails:
+    def test_emails_are_queued_with_the_order(self, api_client, order_payload, mailoutbox):
+        api_client.force_authenticate(user=baker.make(User))
+
+        response = api_client.post('/store/orders/', order_payload(), format='json')
+
+        order = Order.objects.get()
+        assert response.data['id'] == order.id
+        assert list(OutboundEmail.objects.order_by('id').values_list('to', flat=True)) == \
+            [[order.billing_address.email], ['info@treatnaturally.co.uk']]
+        assert mailoutbox == []
+
+    def test_a_failing_order_created_receiver_does_not_block_the_order(self, place_order):
+        def fail(sender, **kwargs):
+            raise RuntimeError('receiver failed')
+
+        order_created.connect(fail)
+        try:
+            order = place_order(baker.make(User), [(baker.make(Product, price=10, stock=5), None, 1)])
+        finally:
+            order_created.disconnect(fail)
+
+        assert Order.objects.get() == order
+        assert OutboundEmail.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestIdempotentOrders:
+    def test_if_key_is_repeated_replays_the_first_order(self, api_client, order_payload):
+        api_client.force_authenticate(user=baker.make(User))
+        payload = order_payload()
+
+        first = api_client.post('/store/orders/', payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        second = api_client.post('/store/orders/', payload, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        assert first.status_code == second.status_code == status.HTTP_200_OK
+        assert second.data['id'] == first.data['id']
+        assert second['Idempotent-Replayed'] == 'true'
+        assert Order.objects.count() == 1
+
+    def test_if_key_is_reused_for_another_request_returns_422(self, api_client, order_payload):
+        api_client.force_authenticate(user=baker.make(User))
+
+        api_client.post('/store/orders/', order_payload(), format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        response = api_client.post('/store/orders/', order_payload(), format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert Order.objects.count() == 1
+
+    def test_lock_taken_over_by_a_duplicate_is_not_released(self):
+        cache.add('idempotency:lock:abc', 'duplicate', 30)
+
+        idempotency._release('idempotency:lock:abc', 'expired')
+
+        assert cache.get('idempotency:lock:abc') == 'duplicate'
+
+
+@pytest.mark.skipif(connection.vendor == 'sqlite', reason='SQLite locks the whole database for writes')
+@pytest.mark.django_db(transaction=True)
+class TestIdempotentOrdersConcurrently:
+    def test_concurrent_duplicates_place_one_order(self, order_payload):
+        user = baker.make(User)
+        payload = order_payload()
+
+        def attempt(_):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            try:
+                return client.post('/store/orders/', payload, format='json', HTTP_IDEMPOTENCY_KEY='abc').data['id']
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            order_ids = set(executor.map(attempt, range(6)))
+
+        assert len(order_ids) == 1
+        assert Order.objects.count() == 1
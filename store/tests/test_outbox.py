@@ -0,0 +1,79 @@
+from datetime import timedelta
+from django.utils import timezone
+from model_bakery import baker
+import pytest
+from core.models import OutboundEmail
+from core.outbox import MAX_ATTEMPTS, queue_email
+from core.tasks import deliver_outbox, purge_outbox
+
+
+@pytest.mark.django_db
+class TestDeliverOutbox:
+    def test_sends_due_emails_and_marks_them_sent(self, mailoutbox):
+        for index in range(3):
+            queue_email(f'Subject {index}', 'Body', None, [f'user{index}@example.com'], html_message='<p>Body</p>')
+        later = baker.make(OutboundEmail, to=['later@example.com'], next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        result = deliver_outbox(batch_size=2)
+
+        assert result == {'sent': 3, 'failed': 0}
+        assert sorted(email.to[0] for email in mailoutbox) == ['user0@example.com', 'user1@example.com', 'user2@example.com']
+        assert mailoutbox[0].alternatives == [('<p>Body</p>', 'text/html')]
+        assert OutboundEmail.objects.filter(status=OutboundEmail.STATUS_SENT, sent_at__isnull=False).count() == 3
+        later.refresh_from_db()
+        assert later.status == OutboundEmail.STATUS_PENDING
+
+    def test_if_sending_fails_backs_off_then_gives_up(self, settings):
+        settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+        settings.EMAIL_HOST = 'localhost'
+        settings.EMAIL_PORT = 1
+        settings.EMAIL_USE_SSL = False
+        settings.EMAIL_USE_TLS = False
+        settings.EMAIL_TIMEOUT = 1
+        retried = queue_email('Retried', 'Body', None, ['user@example.com'])
+        last = baker.make(OutboundEmail, to=['user@example.com'], attempts=MAX_ATTEMPTS - 1)
+
+        result = deliver_outbox()
+
+        assert result == {'sent': 0, 'failed': 2}
+        retried.refresh_from_db()
+        assert retried.status == OutboundEmail.STATUS_PENDING
+        assert retried.attempts == 1
+        assert retried.next_attempt_at > timezone.now()
+        assert retried.last_error
+        last.refresh_from_db()
+        assert last.status == OutboundEmail.STATUS_DEAD
+
+    def test_leased_emails_are_only_sent_once_the_lease_runs_out(self, mailoutbox):
+        now = timezone.now()
+        baker.make(OutboundEmail, to=['leased@example.com'], status=OutboundEmail.STATUS_SENDING, attempts=1,
+                   next_attempt_at=now + timedelta(minutes=5))
+        expired = baker.make(OutboundEmail, to=['expired@example.com'], status=OutboundEmail.STATUS_SENDING, attempts=1,
+                             next_attempt_at=now - timedelta(minutes=5))
+        last = baker.make(OutboundEmail, to=['last@example.com'], status=OutboundEmail.STATUS_SENDING, attempts=MAX_ATTEMPTS,
+                          next_attempt_at=now - timedelta(minutes=5))
+
+        result = deliver_outbox()
+
+        assert result == {'sent': 1, 'failed': 0}
+        assert [email.to for email in mailoutbox] == [['expired@example.com']]
+        expired.refresh_from_db()
+        assert expired.status == OutboundEmail.STATUS_SENT
+        assert expired.attempts == 2
+        last.refresh_from_db()
+        assert last.status == OutboundEmail.STATUS_DEAD
+
+
+@pytest.mark.django_db
+class TestPurgeOutbox:
+    def test_deletes_only_emails_sent_before_the_retention(self, settings):
+        settings.OUTBOX_RETENTION = 60 * 60
+        now = timezone.now()
+        baker.make(OutboundEmail, status=OutboundEmail.STATUS_SENT, sent_at=now - timedelta(hours=2), _quantity=3)
+        recent = baker.make(OutboundEmail, status=OutboundEmail.STATUS_SENT, sent_at=now)
+        pending = baker.make(OutboundEmail)
+        dead = baker.make(OutboundEmail, status=OutboundEmail.STATUS_DEAD)
+
+        assert purge_outbox(batch_size=2) == 3
+
+        assert set(OutboundEmail.objects.values_list('id', flat=True)) == {recent.id, pending.id, dead.id}
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from model_bakery import baker
+import pytest
+from store.models import Cart, CartItem, Coupon, Membership, Product, ProductVariation
+from store.pricing import PricingEngine, with_tax
+
+
+@pytest.mark.django_db
+class TestPricingEngine:
+    def test_applies_discounts_in_order(self):
+        product = baker.make(Product, price=Decimal('20.00'), discount=Decimal(10), offerend=None)
+        variation = baker.make(ProductVariation, product=product, price=Decimal('40.00'), discount=None)
+        engine = PricingEngine(
+            membership=baker.make(Membership, discount=Decimal(5)),
+            coupon=baker.make(Coupon, discount=Decimal(50)))
+
+        priced, total = engine.price_lines([(product, None, 2), (product, variation, 1)])
+
+        assert priced == [(Decimal('8.55'), Decimal('17.10')), (Decimal('17.10'), Decimal('17.10'))]
+        assert total == Decimal('34.20')
+
+    def test_ignores_expired_offer(self):
+        product = baker.make(
+            Product, price=Decimal('20.00'), discount=Decimal(10),
+            offerend=timezone.now() - timedelta(days=1))
+
+        assert PricingEngine().unit_prices([(product, None)]) == [Decimal('20.00')]
+
+    def test_recomputes_cached_price_after_offer_ends(self):
+        offerend = timezone.now() + timedelta(hours=1)
+        product = baker.make(Product, price=Decimal('20.00'), discount=Decimal(10), offerend=offerend)
+
+        assert PricingEngine().unit_prices([(product, None)]) == [Decimal('18.00')]
+        later = PricingEngine(now=offerend + timedelta(seconds=1))
+        assert later.unit_prices([(product, None)]) == [Decimal('20.00')]
+
+    def test_with_tax_is_rounded(self):
+        assert with_tax(Decimal('12.50')) == Decimal('13.75')
+
+
+@pytest.mark.django_db
+class TestCartPrices:
+    def test_cart_total_is_priced_server_side(self, api_client):
+        product = baker.make(Product, price=Decimal('10.00'), discount=Decimal(20), offerend=None)
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product=product, quantity=3, final_price_after_discount=Decimal('1.00'))
+
+        response = api_client.get(f'/store/carts/{cart.id}/')
+
+        assert response.data['total_price'] == Decimal('24.00')
+        assert response.data['items'][0]['final_price_after_discount'] == Decimal('24.00')
+        assert response.data['items'][0]['total_price'] == Decimal('24.00')
+
+
+@pytest.mark.django_db
+class TestProductPrices:
+    def test_price_with_tax_includes_running_offer(self, api_client, create_products, django_capture_on_commit_callbacks):
+        product = create_products(1)[0]
+        with django_capture_on_commit_callbacks(execute=True):
+            product.discount = Decimal(20)
+            product.offerend = timezone.now() + timedelta(days=1)
+            product.save()
+
+        listed = api_client.get('/store/products/').data['results'][0]
+        retrieved = api_client.get(f'/store/products/{product.id}/').data
+
+        assert listed['price_with_tax'] == retrieved['price_with_tax'] == Decimal('8.80')
@@ -0,0 +1,333 @@
+from datetime import timedelta
+from django.db import connection
+from django.utils import timezone
+from rest_framework import status
+import pytest
+from blog.models import BlogPost
+from store.models import Category, Product, ProductImage, ProductListing, ProductVariation
+from store.search import get_search_backend
+from store.tasks import expire_product_offers
+from tags.models import Tag, TaggedItem
+from model_bakery import baker
+
+
+@pytest.mark.django_db
+class TestListProducts:
+    def test_if_list_is_paginated_returns_200(self, api_client, create_products):
+        create_products(12)
+
+        response = api_client.get('/store/products/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 12
+        assert len(response.data['results']) == 10
+        assert response.data['next'] is not None
+
+    @pytest.mark.parametrize('count', [1, 10])
+    def test_query_count_does_not_depend_on_page_size(self, api_client, create_products, django_assert_num_queries, count):
+        create_products(count)
+
+        # validators, count, product ids, listings
+        with django_assert_num_queries(4):
+            response = api_client.get('/store/products/')
+
+        assert response.status_code == status.HTTP_200_OK
+        product = response.data['results'][0]
+        assert len(product['variations']) == 2
+        assert len(product['images']) == 2
+        assert len(product['category']) == 1
+
+
+@pytest.mark.django_db
+class TestCatalogCache:
+    def test_if_catalog_is_unchanged_does_not_hit_database(self, api_client, create_products, django_assert_num_queries):
+        create_products(3)
+        api_client.get('/store/products/')
+
+        with django_assert_num_queries(0):
+            response = api_client.get('/store/products/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 3
+
+    def test_if_product_is_saved_cache_is_invalidated(self, api_client, create_products, django_capture_on_commit_callbacks):
+        product = create_products(1)[0]
+        api_client.get(f'/store/products/{product.id}/')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.name = 'renamed'
+            product.save()
+        response = api_client.get(f'/store/products/{product.id}/')
+
+        assert response.data['name'] == 'renamed'
+
+    def test_if_category_is_saved_product_list_is_invalidated(self, api_client, create_products, django_capture_on_commit_callbacks):
+        create_products(1)
+        api_client.get('/store/products/')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            category = Category.objects.get()
+            category.title = 'renamed'
+            category.save()
+        response = api_client.get('/store/products/')
+
+        assert response.data['results'][0]['category'][0]['title'] == 'renamed'
+
+
+@pytest.fixture(params=['sqlite', 'like', 'memory'])
+def search_backend(request, settings):
+    settings.PRODUCT_SEARCH_BACKEND = request.param
+    if request.param == 'sqlite' and connection.vendor != 'sqlite':
+        pytest.skip('FTS5 index is only available on SQLite')
+    backend = get_search_backend()
+    if request.param == 'memory':
+        backend.reset()
+    return backend
+
+
+@pytest.mark.django_db
+class TestSearchProducts:
+    def test_results_are_ranked_by_relevance(self, api_client, search_backend):
+        weak = baker.make(Product, name='Vitamin C', fullDescription='Good for colds', price=10, stock=5)
+        strong = baker.make(Product, name='Echinacea', shortDescription='colds relief', fullDescription='colds, colds and more colds', price=10, stock=5)
+        baker.make(Product, name='Magnesium', price=10, stock=5)
+
+        response = api_client.get('/store/products/', {'search': 'cold'})
+
+        assert [product['id'] for product in response.data['results']] == [strong.id, weak.id]
+
+    def test_if_product_is_saved_index_is_updated(self, api_client, search_backend):
+        product = baker.make(Product, name='Zinc', price=10, stock=5)
+        api_client.get('/store/products/', {'search': 'zinc'})
+
+        product.name = 'Selenium'
+        product.save()
+        response = api_client.get('/store/products/', {'search': 'selenium'})
+
+        assert [product['id'] for product in response.data['results']] == [product.id]
+
+    def test_name_filter_only_matches_name(self, api_client, search_backend):
+        product = baker.make(Product, name='Turmeric', price=10, stock=5)
+        baker.make(Product, name='Ginger', fullDescription='Pairs well with turmeric', price=10, stock=5)
+
+        response = api_client.get('/store/products/', {'name': 'turm'})
+
+        assert [product['id'] for product in response.data['results']] == [product.id]
+
+
+@pytest.mark.django_db
+class TestCursorPaginateProducts:
+    def test_pages_cover_every_product_once_in_order(self, api_client):
+        products = [baker.make(Product, name=name, price=10, stock=5) for name in 'abcab' * 5]
+        expected = [product.id for product in sorted(products, key=lambda product: (product.name, product.id))]
+
+        ids = []
+        response = api_client.get('/store/products/', {'pagination': 'cursor'})
+        while True:
+            ids += [product['id'] for product in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = api_client.get(response.data['next'])
+
+        assert ids == expected
+
+    def test_previous_link_returns_previous_page(self, api_client):
+        baker.make(Product, price=10, stock=5, _quantity=25)
+        first = api_client.get('/store/products/', {'pagination': 'cursor'})
+        second = api_client.get(first.data['next'])
+
+        response = api_client.get(second.data['previous'])
+
+        assert response.data['results'] == first.data['results']
+
+    def test_honours_requested_ordering(self, api_client):
+        products = [baker.make(Product, price=price, stock=5) for price in [5, 20, 10, 20, 15] * 3]
+        expected = [product.id for product in sorted(products, key=lambda product: (-product.price, -product.id))]
+
+        ids = []
+        response = api_client.get('/store/products/', {'pagination': 'cursor', 'ordering': '-price'})
+        while True:
+            ids += [product['id'] for product in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = api_client.get(response.data['next'])
+
+        assert ids == expected
+
+    def test_if_results_are_ranked_by_search_returns_400(self, api_client):
+        baker.make(Product, name='Zinc', price=10, stock=5)
+
+        response = api_client.get('/store/products/', {'pagination': 'cursor', 'search': 'zinc'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_if_cursor_is_invalid_returns_404(self, api_client):
+        response = api_client.get('/store/products/', {'cursor': 'garbage'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_view_has_no_ordering_fields_returns_400(self, api_client):
+        baker.make(BlogPost, _quantity=3)
+
+        response = api_client.get('/blog/', {'ordering': 'title'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestConditionalGetProducts:
+    def test_if_etag_matches_returns_304_with_one_query(self, api_client, authenticate, create_products, django_assert_num_queries):
+        authenticate()
+        create_products(3)
+        etag = api_client.get('/store/products/')['ETag']
+
+        with django_assert_num_queries(1):
+            response = api_client.get('/store/products/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response['ETag'] == etag
+
+    def test_if_etag_matches_cached_response_returns_304_without_queries(self, api_client, create_products, django_assert_num_queries):
+        create_products(3)
+        etag = api_client.get('/store/products/')['ETag']
+
+        with django_assert_num_queries(0):
+            response = api_client.get('/store/products/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_if_variation_changes_etag_changes(self, api_client, create_products, django_capture_on_commit_callbacks):
+        product = create_products(1)[0]
+        etag = api_client.get(f'/store/products/{product.id}/')['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            variation = product.variations.first()
+            variation.type = 'changed'
+            variation.save()
+        response = api_client.get(f'/store/products/{product.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_if_product_is_deleted_category_etag_changes(self, api_client, create_products, django_capture_on_commit_callbacks):
+        create_products(2)
+        etag = api_client.get('/store/categories/')['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Product.objects.first().delete()
+        response = api_client.get('/store/categories/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data[0]['products_count'] == 1
+
+
+@pytest.mark.django_db
+class TestProductListing:
+    def test_listing_matches_product_serializer(self, api_client, create_products):
+        product = create_products(1)[0]
+
+        listed = api_client.get('/store/products/').data['results'][0]
+        retrieved = api_client.get(f'/store/products/{product.id}/').data
+
+        assert listed == retrieved
+
+    def test_if_listing_is_missing_it_is_built(self, api_client, create_products):
+        create_products(2)
+        ProductListing.objects.all().delete()
+
+        response = api_client.get('/store/products/')
+
+        assert len(response.data['results']) == 2
+        assert ProductListing.objects.count() == 2
+
+    def test_if_tag_is_added_listing_is_refreshed(self, create_products, django_capture_on_commit_callbacks):
+        product = create_products(1)[0]
+        tag = baker.make(Tag)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TaggedItem.objects.create(tag=tag, content_object=product)
+
+        assert ProductListing.objects.get(pk=product.pk).tag_ids == [tag.id]
+
+    def test_if_category_is_deleted_listing_is_refreshed(self, create_products, django_capture_on_commit_callbacks):
+        product = create_products(1)[0]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Category.objects.get().delete()
+
+        assert ProductListing.objects.get(pk=product.pk).categories == []
+
+    def test_if_offer_has_ended_listing_is_refreshed(self, create_products, django_capture_on_commit_callbacks):
+        product = create_products(1)[0]
+        with django_capture_on_commit_callbacks(execute=True):
+            product.discount = 20
+            product.offerend = timezone.now() + timedelta(hours=1)
+            product.save()
+        assert ProductListing.objects.get(pk=product.pk).is_discounted
+        ended = timezone.now() - timedelta(minutes=1)
+        Product.objects.filter(pk=product.pk).update(offerend=ended)
+        ProductListing.objects.filter(pk=product.pk).update(offerend=ended)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert expire_product_offers() == 1
+
+        listing = ProductListing.objects.get(pk=product.pk)
+        assert not listing.is_discounted
+        assert listing.effective_price == product.price
+
+
+@pytest.mark.django_db
+class TestProductFacets:
+    def test_facet_counts_follow_filters(self, api_client):
+        vitamins, minerals = baker.make(Category, _quantity=2)
+        tag = baker.make(Tag)
+        cheap = baker.make(Product, price=5, stock=5)
+        cheap.category.add(vitamins)
+        pricey = baker.make(Product, price=60, stock=5)
+        pricey.category.add(vitamins, minerals)
+        TaggedItem.objects.create(tag=tag, content_object=pricey)
+        other = baker.make(Product, price=30, stock=5)
+        other.category.add(minerals)
+
+        response = api_client.get('/store/products/', {'category': vitamins.id, 'facets': 'category,tag,price'})
+
+        assert response.data['facets'] == {
+            'category': [{'value': vitamins.id, 'count': 2}, {'value': minerals.id, 'count': 1}],
+            'tag': [{'value': tag.id, 'count': 1}],
+            'price': [{'value': '0-10', 'count': 1}, {'value': '50-100', 'count': 1}],
+        }
+
+    def test_facets_take_one_query(self, api_client, create_products, django_assert_num_queries):
+        create_products(3)
+
+        # validators, count, product ids, listings, facets
+        with django_assert_num_queries(5):
+            response = api_client.get('/store/products/', {'facets': 'category,ailment,tag,price'})
+
+        assert set(response.data['facets']) == {'category', 'ailment', 'tag', 'price'}
+
+    def test_if_facet_is_unknown_returns_400(self, api_client):
+        response = api_client.get('/store/products/', {'facets': 'colour'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    def test_list_returns_only_selected_fields(self, api_client, create_products):
+        create_products(2)
+
+        response = api_client.get('/store/products/', {'fields': 'id,name,price,images'})
+
+        assert set(response.data['results'][0]) == {'id', 'name', 'price', 'images'}
+
+    def test_retrieve_omits_fields_and_skips_prefetches(self, api_client, create_products, django_assert_num_queries):
+        product = create_products(1)[0]
+
+        # validators, product, images
+        with django_assert_num_queries(3):
+            response = api_client.get(f'/store/products/{product.id}/', {'omit': 'fullDescription,variations,category'})
+
+        assert 'fullDescription' not in response.data
+        assert 'variations' not in response.data
+        assert len(response.data['images']) == 2
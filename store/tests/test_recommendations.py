@@ -0,0 +1,56 @@
+from model_bakery import baker
+from rest_framework import status
+import pytest
+from core.models import User
+from store.models import Order, OrderItem, ProductListing, ProductRecommendation
+from store.recommendations import build_recommendations
+
+
+@pytest.fixture
+def place_orders():
+    def do_place_orders(baskets):
+        customer = baker.make(User).customer
+        for basket in baskets:
+            order = baker.make(Order, customer=customer)
+            for product in basket:
+                baker.make(OrderItem, order=order, product=product, quantity=1, unit_price=1)
+    return do_place_orders
+
+
+@pytest.mark.django_db
+class TestRecommendations:
+    def test_neighbours_are_ranked_by_co_purchases(self, create_products, place_orders):
+        oil, tea, soap, salt = create_products(4)
+        place_orders([[oil, tea], [oil, tea, soap], [oil, soap], [oil, tea], [salt]])
+
+        build_recommendations(top_n=1, batch_size=3)
+
+        recommendations = ProductRecommendation.objects.filter(product=oil)
+        assert [(r.related_id, r.rank, r.score) for r in recommendations] == [(tea.id, 1, 0.75)]
+        assert not ProductRecommendation.objects.filter(product=salt).exists()
+
+    def test_related_endpoint_reads_two_queries(self, api_client, create_products, place_orders, django_assert_num_queries):
+        oil, tea, soap = create_products(3)
+        place_orders([[oil, tea], [oil, tea, soap], [oil, soap], [oil, tea]])
+        build_recommendations()
+
+        with django_assert_num_queries(2):
+            response = api_client.get(f'/store/products/{oil.id}/related/')
+
+        assert [product['id'] for product in response.data] == [tea.id, soap.id]
+        assert response.data[0]['name'] == tea.name
+
+    def test_if_listing_is_missing_it_is_built(self, api_client, create_products, place_orders):
+        oil, tea = create_products(2)
+        place_orders([[oil, tea]])
+        build_recommendations()
+        ProductListing.objects.filter(pk=tea.id).delete()
+
+        response = api_client.get(f'/store/products/{oil.id}/related/')
+
+        assert [product['id'] for product in response.data] == [tea.id]
+
+    def test_if_product_does_not_exist_returns_404(self, api_client):
+        response = api_client.get('/store/products/0/related/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
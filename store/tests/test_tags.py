@@ -0,0 +1,82 @@
+from django.contrib.contenttypes.models import ContentType
+from model_bakery import baker
+from rest_framework import status
+import pytest
+from ailments.models import Ailment, AilmentItem
+from store.models import Category, Product, ProductListing
+from tags.models import Tag, TaggedItem
+
+
+@pytest.fixture
+def tag_objects():
+    def do_tag_objects(tag_model, item_model, field):
+        targets = baker.make(Product, price=1, stock=1, _quantity=3) + baker.make(Category, _quantity=2)
+        for parent in baker.make(tag_model, _quantity=2):
+            for target in targets:
+                item_model.objects.create(**{
+                    field: parent,
+                    'content_type': ContentType.objects.get_for_model(target),
+                    'object_id': target.pk,
+                })
+        return targets
+    return do_tag_objects
+
+
+@pytest.mark.django_db
+class TestGenericTargets:
+    @pytest.mark.parametrize('url,tag_model,item_model,field,items', [
+        ('/tags/', Tag, TaggedItem, 'tag', 'taggeditems'),
+        ('/ailments/', Ailment, AilmentItem, 'ailment', 'ailmentitems'),
+    ])
+    def test_targets_take_one_query_per_content_type(self, api_client, tag_objects, django_assert_num_queries, url, tag_model, item_model, field, items):
+        targets = tag_objects(tag_model, item_model, field)
+
+        # parents, items, products, categories
+        with django_assert_num_queries(4):
+            response = api_client.get(url)
+
+        resolved = {(item['content_type'], item['content_object']) for item in response.data[0][items]}
+        assert resolved == {(ContentType.objects.get_for_model(target).id, target.pk) for target in targets}
+
+
+@pytest.mark.django_db
+class TestProductsByAilmentOrTag:
+    def test_ailment_products_endpoint(self, api_client, create_products):
+        oil, tea, soap = create_products(3)
+        ailment = baker.make(Ailment)
+        for product in [soap, oil]:
+            AilmentItem.objects.create(ailment=ailment, content_object=product)
+        TaggedItem.objects.create(tag=baker.make(Tag), content_object=tea)
+
+        response = api_client.get(f'/ailments/{ailment.id}/products/')
+
+        assert response.data['count'] == 2
+        assert {product['id'] for product in response.data['results']} == {oil.id, soap.id}
+
+    def test_ailment_products_include_products_without_a_listing(self, api_client):
+        product = baker.make(Product, price=10, stock=5)
+        ailment = baker.make(Ailment)
+        AilmentItem.objects.create(ailment=ailment, content_object=product)
+        assert not ProductListing.objects.exists()
+
+        response = api_client.get(f'/ailments/{ailment.id}/products/')
+
+        assert [product['id'] for product in response.data['results']] == [product.id]
+
+    def test_if_ailment_does_not_exist_returns_404(self, api_client):
+        response = api_client.get('/ailments/0/products/')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_product_list_filters_by_ailment_and_tag(self, api_client, create_products):
+        oil, tea = create_products(2)
+        ailment = baker.make(Ailment)
+        tag = baker.make(Tag)
+        AilmentItem.objects.create(ailment=ailment, content_object=oil)
+        TaggedItem.objects.create(tag=tag, content_object=tea)
+
+        by_ailment = api_client.get('/store/products/', {'ailment': ailment.id})
+        by_tag = api_client.get('/store/products/', {'tag': tag.id})
+
+        assert [product['id'] for product in by_ailment.data['results']] == [oil.id]
+        assert [product['id'] for product in by_tag.data['results']] == [tea.id]
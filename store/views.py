@@ -1,5 +1,7 @@
 from django.shortcuts import render
 from django.db.models.aggregates import Count
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action, permission_classes
@@ -9,22 +11,110 @@ from rest_framework.permissions import AllowAny, DjangoModelPermissions, DjangoM
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from store.permissions import FullDjangoModelPermissions, IsAdminOrReadOnly, IsAdminUserOrPostRequest, ViewCustomerHistoryPermission
-from store.pagination import DefaultPagination
-from .filters import ProductFilter
-from .models import BillingAddress, Cart, CartItem, Category, Coupon, Customer, Interest, OptionalShippingAddress, Order, OrderItem, Product, ProductImage, Review
-from .serializers import AddCartItemSerializer, BillingAddressSerializer, CartItemSerializer, CartSerializer, CategorySerializer, CouponSerializer, CreateOrderSerializer, CustomerSerializer, InterestsSerializer, OptionalShippingAddressSerializer, OrderSerializer, ProductImageSerializer, ProductSerializer, ReviewSerializer, UpdateCartItemSerializer, UpdateOrderSerializer
-
-
-class ProductViewSet(ModelViewSet):
-    queryset = Product.objects.prefetch_related('images').all()
-    serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+from store.pagination import DefaultPagination, OrderKeysetPagination, ProductKeysetPagination
+from core.idempotency import idempotent
+from core.mixins import ConditionalGetMixin
+from .caching import CatalogCacheMixin
+from .carts import get_cart_storage
+from .facets import FACETS, facet_counts
+from .listing import get_listings
+from .pricing import get_membership
+from .filters import ProductFilter, ProductSearchFilter
+from .models import BillingAddress, Cart, CartItem, Category, Coupon, Customer, Interest, OptionalShippingAddress, Order, OrderItem, Product, ProductImage, ProductRecommendation, Review
+from .serializers import AddCartItemSerializer, BillingAddressSerializer, CartItemBatchSerializer, CartItemSerializer, CartSerializer, CategorySerializer, CouponSerializer, CreateOrderSerializer, CustomerSerializer, InterestsSerializer, OptionalShippingAddressSerializer, OrderSerializer, ProductImageSerializer, ProductListingSerializer, ProductSerializer, ReviewSerializer, UpdateCartItemSerializer, UpdateOrderSerializer, selected_fields
+
+
+PRODUCT_COLUMNS = ['name', 'shortDescription', 'fullDescription', 'slug', 'stock', 'price', 'new', 'discount']
+PRODUCT_PREFETCHES = ['images', 'variations', 'category']
+ORDER_COLUMNS = {'customer': 'customer_id', 'final_price': 'final_price', 'billing_address': 'billing_address_id', 'payment_status': 'payment_status'}
+
+
+class ProductViewSet(CatalogCacheMixin, ConditionalGetMixin, ModelViewSet):
+    pagination_class = DefaultPagination
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     filterset_class = ProductFilter
     permission_classes = [IsAdminOrReadOnly]
     search_fields = ['name', 'shortDescription', 'fullDescription']
     ordering_fields = ['price', 'last_update']
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = ProductKeysetPagination()
+            else:
+                self._paginator = DefaultPagination()
+        return self._paginator
+
+    def get_queryset(self):
+        if self.action == 'list':
+            # filtered here; the page's rows come from ProductListing
+            return Product.objects.all()
+        if self.action == 'retrieve':
+            fields = selected_fields(self.request, ProductSerializer.Meta.fields)
+            columns = [field for field in fields if field in PRODUCT_COLUMNS]
+            if 'price_with_tax' in fields:
+                columns += ['price', 'discount', 'offerend']
+            return Product.objects \
+                .only('id', *columns) \
+                .prefetch_related(*[field for field in PRODUCT_PREFETCHES if field in fields])
+        return Product.objects.prefetch_related(*PRODUCT_PREFETCHES).all()
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ProductListingSerializer
+        return ProductSerializer
+
+    def get_facets(self):
+        facets = [facet for facet in self.request.query_params.get('facets', '').split(',') if facet]
+        unknown = set(facets) - set(FACETS)
+        if unknown:
+            raise ValidationError({'facets': [f"Unknown facet '{facet}'." for facet in sorted(unknown)]})
+        return facets
+
+    def paginate_queryset(self, queryset):
+        # Filters, search, ordering and the count still run on Product and
+        # its join tables (the search backends and the category / tag /
+        # ailment filters need them); only the page's rows are read from
+        # the projection, by id.
+        self.filtered_queryset = queryset
+        page = super().paginate_queryset(queryset.only('id', 'name', *self.ordering_fields))
+        fields = selected_fields(self.request, ProductListingSerializer.Meta.fields)
+        return get_listings([product.id for product in page], fields)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        facets = self.get_facets()
+        if facets:
+            response.data['facets'] = facet_counts(self.filtered_queryset, facets)
+        return response
+
+    def get_cache_namespaces(self):
+        if self.action == 'retrieve':
+            return [f"product:{self.kwargs['pk']}", 'categories']
+        if self.action == 'related':
+            return ['products', 'categories', 'recommendations']
+        return ['products', 'categories']
+
+    @action(detail=True)
+    def related(self, request, pk):
+        return self.cached_response(self.list_related, request, pk)
+
+    def list_related(self, request, pk):
+        # served from the precomputed table, see store/recommendations.py
+        related_ids = list(ProductRecommendation.objects
+            .filter(product_id=pk)
+            .order_by('rank')
+            .values_list('related_id', flat=True))
+        if not related_ids:
+            get_object_or_404(Product.objects.only('id'), pk=pk)
+        listings = get_listings(related_ids, selected_fields(request, ProductListingSerializer.Meta.fields))
+        serializer = ProductListingSerializer(listings, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
     def get_serializer_context(self):
         return {'request': self.request}
 
@@ -35,11 +125,12 @@ class ProductViewSet(ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, ConditionalGetMixin, ModelViewSet):
     queryset = Category.objects.annotate(
         products_count=Count('products')).all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_namespaces = ['categories']
 
     def destroy(self, request, *args, **kwargs):
         if Product.objects.filter(category_id=kwargs['pk']):
@@ -62,9 +153,21 @@ class CartViewSet(CreateModelMixin,
                   RetrieveModelMixin,
                   DestroyModelMixin,
                   GenericViewSet):
-    queryset = Cart.objects.prefetch_related('items__product').all()
+    queryset = Cart.objects.all()
     serializer_class = CartSerializer
 
+    def get_object(self):
+        cart = get_cart_storage().get(self.kwargs['pk'])
+        if cart is None:
+            raise Http404
+        return cart
+
+    def perform_destroy(self, instance):
+        get_cart_storage().delete(instance.pk)
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'membership': get_membership(self.request.user)}
+
 
 class CartItemViewSet(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
@@ -77,12 +180,26 @@ class CartItemViewSet(ModelViewSet):
         return CartItemSerializer
 
     def get_serializer_context(self):
-        return {'cart_id': self.kwargs['cart_pk']}
+        return {'cart_id': self.kwargs['cart_pk'], 'membership': get_membership(self.request.user)}
 
     def get_queryset(self):
-        return CartItem.objects \
-            .filter(cart_id=self.kwargs['cart_pk']) \
-            .select_related('product')
+        return get_cart_storage().get_items(self.kwargs['cart_pk'])
+
+    def get_object(self):
+        cart_item = get_cart_storage().get_item(self.kwargs['cart_pk'], self.kwargs['pk'])
+        if cart_item is None:
+            raise Http404
+        return cart_item
+
+    def perform_destroy(self, instance):
+        get_cart_storage().remove_item(instance)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request, cart_pk=None):
+        serializer = CartItemBatchSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        cart = serializer.save()
+        return Response(CartSerializer(cart, context=self.get_serializer_context()).data)
 
 
 class CustomerViewSet(ModelViewSet):
@@ -177,6 +294,7 @@ class OptionalShippingAddressViewSet(ModelViewSet):
 
 class OrderViewSet(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+    pagination_class = OrderKeysetPagination
 
     def get_permissions(self):
         if self.request.method in ['PATCH', 'PUT', 'DELETE']:
@@ -185,12 +303,14 @@ class OrderViewSet(ModelViewSet):
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializer(
             data=request.data,
             context={'user_id': self.request.user.id})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
+        prefetch_related_objects([order], Prefetch('items', queryset=OrderItem.objects.select_related('product', 'variation')))
         serializer = OrderSerializer(order)
         return Response(serializer.data)
 
@@ -205,11 +325,19 @@ class OrderViewSet(ModelViewSet):
         user = self.request.user
 
         if user.is_staff:
-            return Order.objects.all()
-
-        customer_id = Customer.objects.only(
-            'id').get(user_id=user.id)
-        return Order.objects.filter(customer_id=customer_id)
+            queryset = Order.objects.all()
+        else:
+            customer_id = Customer.objects.only(
+                'id').get(user_id=user.id)
+            queryset = Order.objects.filter(customer_id=customer_id)
+
+        if self.action in ['list', 'retrieve']:
+            fields = selected_fields(self.request, OrderSerializer.Meta.fields)
+            queryset = queryset.only('id', 'placed_at', *[column for field, column in ORDER_COLUMNS.items() if field in fields])
+            if 'items' in fields:
+                queryset = queryset.prefetch_related(
+                    Prefetch('items', queryset=OrderItem.objects.select_related('product', 'variation')))
+        return queryset
     
 
 class ProductImageViewSet(ModelViewSet):
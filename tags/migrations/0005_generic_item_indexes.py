@@ -0,0 +1,21 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0004_alter_taggeditem_tag'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taggeditem',
+            index=models.Index(fields=['content_type', 'object_id'], name='tags_tagged_content_eaa81e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taggeditem',
+            index=models.Index(fields=['tag', 'content_type', 'object_id'], name='tags_tagged_tag_id_78e941_idx'),
+        ),
+    ]
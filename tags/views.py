@@ -7,7 +7,7 @@ from .serializers import TagSerializer
 
 class TagViewSet(ModelViewSet):
     http_method_names = ['get']
-    queryset = Tag.objects.all()
+    queryset = Tag.objects.prefetch_related('taggeditems__content_object').all()
     serializer_class = TagSerializer
     search_fields = ['label']
 
@@ -0,0 +1,3 @@
+from .celery import celery
+
+__all__ = ['celery']
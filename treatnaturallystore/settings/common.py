@@ -176,6 +176,52 @@ SIMPLE_JWT = {
 
 DEFAULT_FROM_EMAIL = 'from@treatnaturally.co.uk'
 
+# Anonymous catalog responses are invalidated by signals, so they can
+# live for as long as nothing in the catalog changes.
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# 'redis' keeps carts in CART_REDIS_URL until an order is placed, expiring
+# them CART_TTL seconds after they were last used.
+CART_STORAGE = 'sql'
+CART_TTL = 60 * 60 * 24 * 7
+
+# Responses replayed for a repeated Idempotency-Key are kept this long.
+IDEMPOTENCY_TTL = 60 * 60 * 24
+
+# purge_abandoned_carts deletes database carts older than CART_EXPIRY seconds.
+CART_EXPIRY = 60 * 60 * 24 * 30
+
+# purge_outbox deletes emails sent more than OUTBOX_RETENTION seconds ago.
+OUTBOX_RETENTION = 60 * 60 * 24 * 30
+
+# compact_inventory materializes Product.stock from the inventory ledger.
+CELERY_BEAT_SCHEDULE = {
+    'compact_inventory': {
+        'task': 'store.tasks.compact_inventory',
+        'schedule': 60,
+    },
+    'expire_product_offers': {
+        'task': 'store.tasks.expire_product_offers',
+        'schedule': 60,
+    },
+    'rebuild_recommendations': {
+        'task': 'store.tasks.rebuild_recommendations',
+        'schedule': 60 * 60 * 24,
+    },
+    'purge_abandoned_carts': {
+        'task': 'store.tasks.purge_abandoned_carts',
+        'schedule': 60 * 60,
+    },
+    'deliver_outbox': {
+        'task': 'core.tasks.deliver_outbox',
+        'schedule': 60,
+    },
+    'purge_outbox': {
+        'task': 'core.tasks.purge_outbox',
+        'schedule': 60 * 60,
+    },
+}
+
 
 ADMINS = [
     ('Chen', 'admin@femto.co.il')
@@ -31,6 +31,8 @@ DATABASES = {
 
 CELERY_BROKER_URL = 'redis://redis:6379/1'
 
+CART_REDIS_URL = 'redis://redis:6379/3'
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -19,6 +19,8 @@ REDIS_URL = os.environ['REDIS_URL']
 
 CELERY_BROKER_URL = REDIS_URL
 
+CART_REDIS_URL = REDIS_URL
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",